@@ -1,13 +1,21 @@
 import threading
 import time
-import json
-from flask import Flask, jsonify, send_from_directory
+import orjson
+from flask import Flask, jsonify, send_from_directory, request
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from urdfpy import URDF
 import math
-import asyncio
+import functools
+import itertools
 import os
-from app_websocket import send_to_all, run_server as run_websocket_server, has_connected_clients
+import signal
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import numpy as np
+from fk_jit import FK_DTYPE, njit, pack_chain, chain_prefix_poses
+from app_websocket import queue_message, run_server as run_websocket_server, stop_server as stop_websocket_server, has_connected_clients, get_connections_opened
 
 # Get the absolute path of the directory where this script is located
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -23,48 +31,169 @@ else:
     # Local development environment - use relative path
     URDF_DIR = os.path.abspath(os.path.join(BASE_DIR, '..', 'robot_data'))
 
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson, so jsonify handles numpy values natively.
+    Types orjson does not know (Decimal, __html__ objects) and dates fall back to
+    DefaultJSONProvider.default, so they are encoded as Flask would.
+    The sort_keys and compact settings are honoured; orjson only indents by 2 spaces.
+    """
+    
+    option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    
+    def _options(self, sort_keys=None, indent=None):
+        """
+        Returns the orjson options for the given sort_keys and indent arguments.
+        """
+        option = self.option
+        if self.sort_keys if sort_keys is None else sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+    
+    def dumps(self, obj, **kwargs):
+        option = self._options(kwargs.get('sort_keys'), kwargs.get('indent'))
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Pretty-print under the same conditions as DefaultJSONProvider
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        # Hand the encoded bytes straight to the response without a str round trip
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self._options(indent=indent)),
+            mimetype=self.mimetype
+        )
+
 app = Flask(__name__, static_folder=FRONTEND_DIR, static_url_path='')
+app.json = OrjsonProvider(app)
 
 # Enable CORS for all routes
 CORS(app, origins=["http://localhost:5001", "http://127.0.0.1:5001", "*"])
 
-# Debug: Print path information
-print(f"BASE_DIR: {BASE_DIR}")
-print(f"URDF_DIR: {URDF_DIR}")
-
 robot_model_file_path = os.path.join(URDF_DIR, 'ur5', 'ur5.urdf')
-print(f"Robot model file path: {robot_model_file_path}")
-print(f"File exists: {os.path.exists(robot_model_file_path)}")
-
-# List contents of URDF_DIR for debugging
-if os.path.exists(URDF_DIR):
-    print(f"Contents of {URDF_DIR}: {os.listdir(URDF_DIR)}")
-    ur5_dir = os.path.join(URDF_DIR, 'ur5')
-    if os.path.exists(ur5_dir):
-        print(f"Contents of {ur5_dir}: {os.listdir(ur5_dir)}")
-else:
-    print(f"URDF_DIR does not exist: {URDF_DIR}")
 
-robot_arm = URDF.load(robot_model_file_path)
+def print_path_info():
+    """
+    Prints the resolved asset paths for debugging. Called on startup rather than
+    on import so importing the module (e.g. from tests) has no console output.
+    """
+    print(f"BASE_DIR: {BASE_DIR}")
+    print(f"URDF_DIR: {URDF_DIR}")
+    print(f"Robot model file path: {robot_model_file_path}")
+    print(f"File exists: {os.path.exists(robot_model_file_path)}")
+    
+    # List contents of URDF_DIR for debugging
+    if os.path.exists(URDF_DIR):
+        print(f"Contents of {URDF_DIR}: {os.listdir(URDF_DIR)}")
+        ur5_dir = os.path.join(URDF_DIR, 'ur5')
+        if os.path.exists(ur5_dir):
+            print(f"Contents of {ur5_dir}: {os.listdir(ur5_dir)}")
+    else:
+        print(f"URDF_DIR does not exist: {URDF_DIR}")
+
+# The URDF is parsed on first use by get_robot_arm so importing this module stays cheap
+robot_arm = None
+robot_lock = threading.Lock()
+
+# Names of the actuated (non-fixed) joints, in URDF order; filled in by get_robot_arm
+ACTUATED_JOINT_NAMES = ()
+
+# Distinguishes this process's ETags from those of earlier runs, whose counters also started at 0
+BOOT_ID = uuid.uuid4().hex[:12]
+
+class JointState:
+    """
+    Current joint angles stored as a fixed-size float64 array with a name to index map.
+    """
+    
+    # Every instance gets its own generation so a rebuilt state never reuses an ETag
+    _generations = itertools.count()
+    
+    def __init__(self, joint_names):
+        self.names = tuple(joint_names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.angles = np.zeros(len(self.names))
+        self.generation = next(JointState._generations)
+        # Incremented whenever a joint angle changes; part of the /robot_state ETag
+        self.version = 0
+    
+    def get(self, joint_name, default=0.0):
+        """
+        Returns the angle of a joint, or default if the joint is unknown.
+        """
+        idx = self.index.get(joint_name)
+        return default if idx is None else float(self.angles[idx])
+    
+    def set(self, joint_angles):
+        """
+        Updates the angles of the joints in a {joint_name: angle} dict.
+        Unknown joint names are ignored.
+        """
+        for joint_name, angle in joint_angles.items():
+            idx = self.index.get(joint_name)
+            if idx is not None and self.angles[idx] != angle:
+                self.angles[idx] = angle
+                self.version += 1
+    
+    def set_index(self, idx, angle):
+        """
+        Updates the angle of the joint at position idx in names.
+        """
+        if self.angles[idx] != angle:
+            self.angles[idx] = angle
+            self.version += 1
+    
+    def as_dict(self):
+        """
+        Returns the joint angles as a {joint_name: angle} dict for serialization.
+        """
+        return dict(zip(self.names, self.angles.tolist()))
 
 # Initialize the current position of the robot arm
-current_joint_angles = {joint.name: 0.0 for joint in robot_arm.joints if joint.joint_type != 'fixed'}
+joint_state = JointState(ACTUATED_JOINT_NAMES)
 
-def send_to_websocket(data):
+def resolve_end_effector_link(robot):
+    """
+    Returns the end effector link of the robot, falling back to the last link.
+    """
+    links = list(robot.links)
+    for link in links:
+        if 'wrist_3_link' in link.name or 'tool0' in link.name or 'ee_link' in link.name:
+            return link
+    return links[-1] if links else None
+
+# The end effector link is fixed by the URDF, so get_robot_arm resolves it once
+EE_LINK = None
+
+def select_end_effector_pose(fk_results):
+    """
+    Returns the end effector entry of a link_fk or link_fk_batch result.
+    Falls back to the last link if the end effector link is not in the result.
+    """
+    end_effector_pose = fk_results.get(EE_LINK)
+    if end_effector_pose is None and fk_results:
+        end_effector_pose = next(reversed(fk_results.values()))
+    return end_effector_pose
+
+def send_to_websocket(data, reliable=False):
     """
     Sends data to all connected WebSocket clients.
+    Reliable frames are never dropped when the send queue or a client falls behind.
     """
     # Only try to send if there are connected clients
     if not has_connected_clients():
         return
         
+    # Hand the frame to the WebSocket server's send queue without waiting on it
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(send_to_all(data))
-        loop.close()
-    except Exception as e:
-        # Silently handle WebSocket errors to not spam the console
+        queue_message(data, reliable=reliable)
+    except RuntimeError:
+        # The server loop closed between the check and the wake-up; nobody is listening
         pass
 
 def generate_movement_sequence():
@@ -72,19 +201,81 @@ def generate_movement_sequence():
     Generates a smooth movement sequence for the robot arm.
     This is a placeholder and can be replaced with more complex logic.
     """
-    sequence = []
     num_steps = 100
     amplitude = math.pi / 4  # 45 degrees
 
-    for i in range(num_steps):
-        joint_angles = {}
-        for joint in robot_arm.joints:
-            if joint.joint_type != 'fixed':
-                # Simple sinusoidal movement for demonstration
-                angle = amplitude * math.sin(2 * math.pi * i / num_steps)
-                joint_angles[joint.name] = angle
-        sequence.append(joint_angles)
-    return sequence
+    # Simple sinusoidal movement for demonstration; all joints share the same angle
+    angles = amplitude * np.sin(2 * np.pi * np.arange(num_steps) / num_steps)
+    return [dict.fromkeys(ACTUATED_JOINT_NAMES, angle) for angle in angles.tolist()]
+
+@njit(cache=True)
+def trapezoid_coefficients(distance, total_time, accel_time):
+    """
+    Returns the (max_velocity, acceleration) of a trapezoidal profile covering distance.
+    """
+    # For trapezoidal profile: distance = 0.5 * accel_time * max_vel + (total_time - 2*accel_time) * max_vel + 0.5 * accel_time * max_vel
+    # Simplifying: distance = max_vel * (total_time - accel_time)
+    if total_time - accel_time > 0:
+        max_velocity = distance / (total_time - accel_time)
+    else:
+        max_velocity = distance / total_time
+    acceleration = max_velocity / accel_time if accel_time > 0 else 0.0
+    return max_velocity, acceleration
+
+@njit(cache=True)
+def sample_trapezoid(t, start_pos, end_pos, total_time, accel_time, max_velocity, acceleration):
+    """
+    Returns the position of a trapezoidal velocity profile at time t.
+    """
+    if t <= 0:
+        return start_pos
+    elif t >= total_time:
+        return end_pos
+    elif t <= accel_time:
+        # Acceleration phase
+        return start_pos + 0.5 * acceleration * t * t
+    elif t <= (total_time - accel_time):
+        # Constant velocity phase
+        accel_distance = 0.5 * acceleration * accel_time * accel_time
+        const_distance = max_velocity * (t - accel_time)
+        return start_pos + accel_distance + const_distance
+    else:
+        # Deceleration phase
+        decel_start_time = total_time - accel_time
+        time_in_decel = t - decel_start_time
+        
+        accel_distance = 0.5 * acceleration * accel_time * accel_time
+        const_distance = max_velocity * (decel_start_time - accel_time)
+        decel_distance = max_velocity * time_in_decel - 0.5 * acceleration * time_in_decel * time_in_decel
+        
+        return start_pos + accel_distance + const_distance + decel_distance
+
+@njit(cache=True)
+def sample_trapezoid_array(t, start_pos, end_pos, total_time, accel_time, max_velocity, acceleration):
+    """
+    Samples a single trapezoidal profile at every time in t.
+    """
+    positions = np.empty(t.shape[0])
+    for i in range(t.shape[0]):
+        positions[i] = sample_trapezoid(
+            t[i], start_pos, end_pos, total_time, accel_time, max_velocity, acceleration
+        )
+    return positions
+
+@njit(cache=True)
+def sample_trapezoid_vec(t, start_pos, end_pos, total_time, accel_time):
+    """
+    Samples one trapezoidal profile per joint at every time in t.
+    Returns a (len(t), len(end_pos)) array of positions.
+    """
+    positions = np.empty((t.shape[0], end_pos.shape[0]))
+    for j in range(end_pos.shape[0]):
+        max_velocity, acceleration = trapezoid_coefficients(end_pos[j] - start_pos[j], total_time, accel_time)
+        for i in range(t.shape[0]):
+            positions[i, j] = sample_trapezoid(
+                t[i], start_pos[j], end_pos[j], total_time, accel_time, max_velocity, acceleration
+            )
+    return positions
 
 def trapezoidal_profile(start_pos, end_pos, total_time, accel_time, max_velocity=None):
     """
@@ -98,50 +289,36 @@ def trapezoidal_profile(start_pos, end_pos, total_time, accel_time, max_velocity
         max_velocity: Maximum velocity (calculated if None)
     
     Returns:
-        A function that takes time t and returns position
+        A function that takes a time t, or an array of times, and returns the position(s)
     """
-    distance = end_pos - start_pos
+    start_pos = float(start_pos)
+    end_pos = float(end_pos)
+    total_time = float(total_time)
+    accel_time = float(accel_time)
     
     # Calculate max velocity if not provided
     if max_velocity is None:
-        # For trapezoidal profile: distance = 0.5 * accel_time * max_vel + (total_time - 2*accel_time) * max_vel + 0.5 * accel_time * max_vel
-        # Simplifying: distance = max_vel * (total_time - accel_time)
-        max_velocity = distance / (total_time - accel_time) if (total_time - accel_time) > 0 else distance / total_time
-    
-    acceleration = max_velocity / accel_time if accel_time > 0 else 0
-    
-    def position_at_time(t):
-        if t <= 0:
-            return start_pos
-        elif t >= total_time:
-            return end_pos
-        elif t <= accel_time:
-            # Acceleration phase
-            return start_pos + 0.5 * acceleration * t * t
-        elif t <= (total_time - accel_time):
-            # Constant velocity phase
-            accel_distance = 0.5 * acceleration * accel_time * accel_time
-            const_distance = max_velocity * (t - accel_time)
-            return start_pos + accel_distance + const_distance
-        else:
-            # Deceleration phase
-            decel_start_time = total_time - accel_time
-            time_in_decel = t - decel_start_time
-            
-            accel_distance = 0.5 * acceleration * accel_time * accel_time
-            const_distance = max_velocity * (decel_start_time - accel_time)
-            decel_distance = max_velocity * time_in_decel - 0.5 * acceleration * time_in_decel * time_in_decel
-            
-            return start_pos + accel_distance + const_distance + decel_distance
+        max_velocity, acceleration = trapezoid_coefficients(end_pos - start_pos, total_time, accel_time)
+    else:
+        max_velocity = float(max_velocity)
+        acceleration = max_velocity / accel_time if accel_time > 0 else 0.0
     
-    return position_at_time
+    # Bind the precomputed coefficients so each evaluation is a single compiled call
+    coefficients = (start_pos, end_pos, total_time, accel_time, max_velocity, acceleration)
+    
+    def profile(t):
+        if np.ndim(t):
+            times = np.asarray(t, dtype=np.float64)
+            return sample_trapezoid_array(times.ravel(), *coefficients).reshape(times.shape)
+        return sample_trapezoid(t, *coefficients)
+    
+    return profile
 
 def generate_trapezoidal_movement_sequence():
     """
     Generates a smooth trapezoidal movement sequence for the robot arm.
     Each joint moves from 0 to a target position and back using trapezoidal interpolation.
     """
-    sequence = []
     total_time = 10.0  # Total time for movement in seconds
     accel_time = 2.0   # Time for acceleration/deceleration
     time_step = 0.1    # Time step for discretization
@@ -157,80 +334,189 @@ def generate_trapezoidal_movement_sequence():
         'wrist_3_joint': math.pi / 4            # 45 degrees
     }
     
-    # Create trapezoidal profiles for each joint
-    joint_profiles = {}
-    for joint in robot_arm.joints:
-        if joint.joint_type != 'fixed':
-            start_pos = 0.0
-            end_pos = target_positions.get(joint.name, 0.0)
-            joint_profiles[joint.name] = trapezoidal_profile(start_pos, end_pos, total_time, accel_time)
+    joint_names = ACTUATED_JOINT_NAMES
+    end_positions = np.array([target_positions.get(name, 0.0) for name in joint_names])
     
-    # Generate the sequence
-    for i in range(num_steps):
-        t = i * time_step
-        joint_angles = {}
-        for joint_name, profile_func in joint_profiles.items():
-            joint_angles[joint_name] = profile_func(t)
-        sequence.append(joint_angles)
+    # Evaluate the trapezoidal profile for all joints over the shared time base at once.
+    # Rows are time steps, columns are joints; every joint starts from 0.
+    t = np.arange(num_steps) * time_step
+    positions = sample_trapezoid_vec(t, np.zeros_like(end_positions), end_positions, total_time, accel_time)
     
-    return sequence
+    # Convert to per-step dicts only at the boundary
+    return [dict(zip(joint_names, row)) for row in positions.tolist()]
 
-def calculate_end_effector_pose(joint_angles):
+class FKCache:
     """
-    Calculate end effector position and orientation from joint angles.
+    Cached forward kinematics for the serial chain from the base to the end effector.
+    
+    The static joint origins and axes are extracted once from the URDF. Every call
+    reuses the cumulative transforms up to the first joint whose angle changed, so
+    moving a single joint only recomputes the part of the chain downstream of it.
+    The downstream part is evaluated by the jitted kernel in fk_jit.
     """
-    try:
-        # Calculate forward kinematics
-        fk_results = robot_arm.link_fk(cfg=joint_angles)
-        
-        # Extract end effector pose (assuming the last link is the end effector)
-        end_effector_pose = None
-        
-        # Find the end effector link (typically the last link in the chain)
-        for link, pose in fk_results.items():
-            if 'wrist_3_link' in link.name or 'tool0' in link.name or 'ee_link' in link.name:
-                end_effector_pose = pose
-                break
+    
+    def __init__(self, robot, end_effector_link):
+        self.chain = self._build_chain(robot, end_effector_link)
+        self.available = bool(self.chain)
+        self._lock = threading.Lock()
+        self._origins, self._axes, self._joint_types = pack_chain(self.chain)
+        self._angles = np.zeros(len(self.chain))
+        self._prefix = np.empty((len(self.chain), 4, 4), dtype=FK_DTYPE)
+        self._valid = 0
+        self._key = None
+        self._pose = None
+    
+    @staticmethod
+    def _build_chain(robot, end_effector_link):
+        """
+        Returns a list of (joint_name, joint_type, origin, axis) tuples from
+        the base to the end effector, or an empty list if the chain is not supported.
+        """
+        if end_effector_link is None:
+            return []
+        try:
+            joints = list(robot.joints)
+        except TypeError:
+            return []
         
-        # If no specific end effector link found, use the last link
-        if end_effector_pose is None and fk_results:
-            end_effector_pose = list(fk_results.values())[-1]
+        joint_by_child = {joint.child: joint for joint in joints}
+        chain = []
+        link_name = end_effector_link.name
+        while link_name in joint_by_child:
+            joint = joint_by_child[link_name]
+            if joint.joint_type not in ('fixed', 'revolute', 'continuous', 'prismatic') \
+                    or joint.mimic is not None:
+                return []
+            
+            axis = np.asarray(joint.axis, dtype=np.float64)
+            axis = axis / np.linalg.norm(axis)
+            origin = np.asarray(joint.origin, dtype=np.float64)
+            chain.append((joint.name, joint.joint_type, origin, axis))
+            link_name = joint.parent
         
-        # Extract position and orientation from the pose matrix
-        end_effector_position = [0, 0, 0]
-        end_effector_orientation = [0, 0, 0]
+        chain.reverse()
+        return chain
+    
+    def end_effector_pose(self, joint_angles):
+        """
+        Returns the 4x4 end effector pose for the given joint angles.
+        """
+        angles = [
+            0.0 if joint_type == 'fixed' else float(joint_angles.get(name, 0.0))
+            for name, joint_type, _, _ in self.chain
+        ]
+        key = tuple(angles)
         
-        if end_effector_pose is not None:
-            # Position is the translation part (last column, first 3 rows)
-            end_effector_position = [
-                float(end_effector_pose[0, 3]),
-                float(end_effector_pose[1, 3]), 
-                float(end_effector_pose[2, 3])
-            ]
-            
-            # Convert rotation matrix to Euler angles (simplified)
-            import numpy as np
-            # Extract rotation matrix
-            R = end_effector_pose[:3, :3]
+        with self._lock:
+            if key == self._key:
+                return self._pose
             
-            # Convert to Euler angles (ZYX convention)
-            sy = np.sqrt(R[0,0] * R[0,0] + R[1,0] * R[1,0])
-            singular = sy < 1e-6
+            # Find the first joint that changed since the last call
+            start = 0
+            while start < self._valid and angles[start] == self._angles[start]:
+                start += 1
             
-            if not singular:
-                x = np.arctan2(R[2,1], R[2,2])
-                y = np.arctan2(-R[2,0], sy)
-                z = np.arctan2(R[1,0], R[0,0])
-            else:
-                x = np.arctan2(-R[1,2], R[1,1])
-                y = np.arctan2(-R[2,0], sy)
-                z = 0
-                
-            end_effector_orientation = [float(x), float(y), float(z)]
+            self._angles[start:] = angles[start:]
+            pose = chain_prefix_poses(self._angles, self._origins, self._axes,
+                                      self._joint_types, self._prefix, start)
+            self._valid = len(self.chain)
+            self._key = key
+            self._pose = pose
+            return pose
+
+# Replaced by get_robot_arm once the robot is loaded
+fk_cache = FKCache(robot_arm, EE_LINK)
+
+def get_robot_arm():
+    """
+    Returns the robot model, loading the URDF and the state derived from it on first use.
+    """
+    global robot_arm, ACTUATED_JOINT_NAMES, joint_state, EE_LINK, fk_cache
+    if robot_arm is None:
+        with robot_lock:
+            if robot_arm is None:
+                robot = URDF.load(robot_model_file_path)
+                ACTUATED_JOINT_NAMES = tuple(joint.name for joint in robot.joints if joint.joint_type != 'fixed')
+                joint_state = JointState(ACTUATED_JOINT_NAMES)
+                EE_LINK = resolve_end_effector_link(robot)
+                fk_cache = FKCache(robot, EE_LINK)
+                # Poses cached before the robot loaded were computed from other state
+                _ee_pose_cached.cache_clear()
+                robot_arm = robot
+    return robot_arm
+
+def requires_robot(view):
+    """
+    Loads the robot before the view runs, so joint_state and ACTUATED_JOINT_NAMES are populated.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        get_robot_arm()
+        return view(*args, **kwargs)
+    return wrapper
+
+def _pose_to_pos_euler(pose):
+    """
+    Returns the position and ZYX Euler angles of a 4x4 pose matrix as lists.
+    """
+    # Work on plain floats; scalar math is much cheaper than numpy element access
+    R = pose.tolist()
+    
+    # Position is the translation part (last column, first 3 rows)
+    position = [R[0][3], R[1][3], R[2][3]]
+    
+    # Convert to Euler angles (ZYX convention)
+    sy = math.hypot(R[0][0], R[1][0])
+    
+    if sy >= 1e-6:
+        x = math.atan2(R[2][1], R[2][2])
+        y = math.atan2(-R[2][0], sy)
+        z = math.atan2(R[1][0], R[0][0])
+    else:
+        x = math.atan2(-R[1][2], R[1][1])
+        y = math.atan2(-R[2][0], sy)
+        z = 0.0
+    
+    return position, [x, y, z]
+
+@functools.lru_cache(maxsize=256)
+def _ee_pose_cached(angles):
+    """
+    Calculate end effector position and orientation for a tuple of actuated joint
+    angles in ACTUATED_JOINT_NAMES order. Results are cached by angle tuple.
+    """
+    joint_angles = dict(zip(ACTUATED_JOINT_NAMES, angles))
+    
+    # Extract end effector pose (assuming the last link is the end effector)
+    end_effector_pose = None
+    
+    if fk_cache.available:
+        # Only recompute the part of the chain affected by changed joints
+        end_effector_pose = fk_cache.end_effector_pose(joint_angles)
+    else:
+        # Calculate forward kinematics
+        fk_results = get_robot_arm().link_fk(cfg=joint_angles)
+        
+        end_effector_pose = select_end_effector_pose(fk_results)
+    
+    if end_effector_pose is None:
+        return (0, 0, 0), (0, 0, 0)
+    
+    end_effector_position, end_effector_orientation = _pose_to_pos_euler(end_effector_pose)
+    return tuple(end_effector_position), tuple(end_effector_orientation)
+
+def calculate_end_effector_pose(joint_angles):
+    """
+    Calculate end effector position and orientation from joint angles.
+    """
+    try:
+        # Quantize to 1e-6 rad so repeated polls of the same state hit the cache
+        angles = tuple(round(float(joint_angles.get(name, 0.0)), 6) for name in ACTUATED_JOINT_NAMES)
+        end_effector_position, end_effector_orientation = _ee_pose_cached(angles)
         
         return {
-            'position': end_effector_position,
-            'orientation': end_effector_orientation
+            'position': list(end_effector_position),
+            'orientation': list(end_effector_orientation)
         }
     except Exception as e:
         print(f"Error calculating end effector pose: {e}")
@@ -239,85 +525,130 @@ def calculate_end_effector_pose(joint_angles):
             'orientation': [0, 0, 0]
         }
 
-def execute_movement_sequence(sequence):
+def trajectory_frame(sequence, motion_id, time_step):
+    """
+    Packs a whole movement sequence into one frame the frontend can play back.
+    """
+    joint_names = list(sequence[0])
+    joint_angles = np.array([[step[name] for name in joint_names] for step in sequence], dtype=FK_DTYPE)
+    
+    # Calculate forward kinematics for the whole sequence in one batch
+    fk_batch = get_robot_arm().link_fk_batch(cfgs=sequence)
+    end_effector_poses = select_end_effector_pose(fk_batch)
+    
+    positions = np.zeros((len(sequence), 3), dtype=FK_DTYPE)
+    orientations = np.zeros((len(sequence), 3), dtype=FK_DTYPE)
+    if end_effector_poses is not None:
+        for i, pose in enumerate(end_effector_poses):
+            positions[i], orientations[i] = _pose_to_pos_euler(pose)
+    
+    return {
+        'type': 'trajectory',
+        'motion_id': motion_id,
+        'dt': time_step,
+        'joint_names': joint_names,
+        'joint_angles': joint_angles,
+        'end_effector': {
+            'position': positions,
+            'orientation': orientations
+        }
+    }
+
+def execute_movement_sequence(sequence, cancel_event=None, motion_id=None):
     """
     Executes the generated movement sequence.
+    The frontend receives the whole trajectory in a single frame up front and animates
+    it locally; the steps below only keep the joint state current at the same pace.
+    Stops early once cancel_event is set. The frame is tagged with motion_id.
+    
+    The frame is sent again whenever a new client connects mid-move, with start_step
+    set to the step being executed so playback picks up where the arm is.
     """
-    for joint_angles in sequence:
-        set_joint_angles(joint_angles)
-        # Calculate forward kinematics
-        fk_results = robot_arm.link_fk(cfg=joint_angles)
-        
-        # Extract end effector pose (assuming the last link is the end effector)
-        end_effector_link = None
-        end_effector_pose = None
-        
-        # Find the end effector link (typically the last link in the chain)
-        for link, pose in fk_results.items():
-            if 'wrist_3_link' in link.name or 'tool0' in link.name or 'ee_link' in link.name:
-                end_effector_link = link
-                end_effector_pose = pose
-                break
-        
-        # If no specific end effector link found, use the last link
-        if end_effector_pose is None and fk_results:
-            end_effector_link, end_effector_pose = list(fk_results.items())[-1]
-        
-        # Extract position and orientation from the pose matrix
-        end_effector_position = [0, 0, 0]
-        end_effector_orientation = [0, 0, 0]
-        
-        if end_effector_pose is not None:
-            # Position is the translation part (last column, first 3 rows)
-            end_effector_position = [
-                float(end_effector_pose[0, 3]),
-                float(end_effector_pose[1, 3]), 
-                float(end_effector_pose[2, 3])
-            ]
-            
-            # Convert rotation matrix to Euler angles (simplified)
-            import numpy as np
-            # Extract rotation matrix
-            R = end_effector_pose[:3, :3]
-            
-            # Convert to Euler angles (ZYX convention)
-            sy = np.sqrt(R[0,0] * R[0,0] + R[1,0] * R[1,0])
-            singular = sy < 1e-6
-            
-            if not singular:
-                x = np.arctan2(R[2,1], R[2,2])
-                y = np.arctan2(-R[2,0], sy)
-                z = np.arctan2(R[1,0], R[0,0])
-            else:
-                x = np.arctan2(-R[1,2], R[1,1])
-                y = np.arctan2(-R[2,0], sy)
-                z = 0
-                
-            end_effector_orientation = [float(x), float(y), float(z)]
-        
-        # Prepare data for the frontend
-        # Convert numpy arrays to lists for JSON serialization
-        fk_data = {link.name: pose.tolist() for link, pose in fk_results.items()}
+    if not sequence:
+        return
+    if cancel_event is not None and cancel_event.is_set():
+        return
+    
+    time_step = 0.1  # Control the speed of the movement
+    
+    # FK for the whole sequence is only computed once someone is listening
+    frame = None
+    connections_seen = None
+    
+    # Schedule against absolute deadlines so frame cost does not accumulate as drift
+    t0 = time.perf_counter()
+    for i, joint_angles in enumerate(sequence):
+        if cancel_event is not None and cancel_event.is_set():
+            return
         
-        frontend_data = {
-            'joint_angles': joint_angles,
-            'end_effector': {
-                'position': end_effector_position,
-                'orientation': end_effector_orientation
-            },
-            'fk': fk_data
-        }
+        # Count connections rather than clients so a reload that replaces a client
+        # within one step still gets the frame
+        connections = get_connections_opened()
+        if connections != connections_seen and has_connected_clients():
+            if frame is None:
+                frame = trajectory_frame(sequence, motion_id, time_step)
+            frame['start_step'] = i
+            # This frame is the only message for the whole move, so it must not be dropped
+            send_to_websocket(orjson.dumps(frame, option=orjson.OPT_SERIALIZE_NUMPY), reliable=True)
+        connections_seen = connections
         
-        send_to_websocket(json.dumps(frontend_data))
-        time.sleep(0.1)  # Control the speed of the movement
+        set_joint_angles(joint_angles)
+        time.sleep(max(0.0, t0 + (i + 1) * time_step - time.perf_counter()))
 
 def set_joint_angles(joint_angles):
     """
     Sets the angles for each joint of the robot arm.
     """
-    global current_joint_angles
-    for joint_name, angle in joint_angles.items():
-        current_joint_angles[joint_name] = angle
+    joint_state.set(joint_angles)
+
+# A single worker runs robot movements so they never overlap
+MOTION_EXEC = ThreadPoolExecutor(max_workers=1, thread_name_prefix='motion')
+current_motion_future = None
+motion_cancel_event = threading.Event()
+# Monotonic id of the latest movement; frames carry it so clients can drop stale ones
+motion_ids = itertools.count(1)
+current_motion_id = 0
+motion_lock = threading.Lock()
+
+def submit_motion(task):
+    """
+    Cancels the running movement and submits task to the motion worker.
+    The task is called with a threading.Event that is set when it gets superseded
+    and the new movement's motion id.
+    """
+    global current_motion_future, motion_cancel_event, current_motion_id
+    # Requests are served concurrently; swap the active movement atomically
+    with motion_lock:
+        if current_motion_future is not None:
+            current_motion_future.cancel()
+        motion_cancel_event.set()
+        
+        motion_cancel_event = threading.Event()
+        current_motion_id = next(motion_ids)
+        current_motion_future = MOTION_EXEC.submit(task, motion_cancel_event, current_motion_id)
+        return current_motion_future
+
+def shutdown_motion_worker(timeout=None):
+    """
+    Cancels the running movement and waits for the motion worker to finish.
+    Returns False if the movement did not stop within timeout seconds.
+    """
+    with motion_lock:
+        future = current_motion_future
+        if future is not None:
+            future.cancel()
+        motion_cancel_event.set()
+    # Movements check their cancel event every tick, so this returns quickly
+    if future is not None:
+        try:
+            future.result(timeout=timeout)
+        except FutureTimeoutError:
+            return False
+        except Exception:
+            # A movement that was cancelled before starting or failed has nothing to stop
+            pass
+    MOTION_EXEC.shutdown(wait=False)
+    return True
 
 @app.route('/')
 def index():
@@ -328,13 +659,11 @@ def serve_urdf(filename):
     return send_from_directory(os.path.join(URDF_DIR, 'ur5'), filename)
 
 @app.route('/move_joint_smooth', methods=['POST'])
+@requires_robot
 def move_joint_smooth():
     """
     API endpoint to smoothly move a single joint using trapezoidal interpolation.
     """
-    global current_joint_angles
-    from flask import request
-    
     data = request.get_json()
     if not data or 'joint_index' not in data or 'target_angle' not in data:
         return jsonify({"error": "Invalid request data. Need joint_index and target_angle"}), 400
@@ -358,9 +687,9 @@ def move_joint_smooth():
     ]
     
     joint_name = joint_names[joint_index]
-    start_angle = current_joint_angles.get(joint_name, 0.0)
+    start_angle = joint_state.get(joint_name)
     
-    def smooth_movement_task():
+    def smooth_movement_task(cancel_event, motion_id):
         # Create trapezoidal profile for this joint
         profile = trapezoidal_profile(start_angle, target_angle, movement_time, accel_time)
         
@@ -368,7 +697,19 @@ def move_joint_smooth():
         time_step = 0.05  # 20 Hz update rate
         num_steps = int(movement_time / time_step)
         
+        # Joint angles already sent to the frontend; later frames only carry changes
+        prev_angles = None
+        connections_seen = None
+        
+        # Resolve the joint's slot once so each tick is a scalar store into the state array
+        joint_idx = joint_state.index.get(joint_name)
+        
+        # Schedule against absolute deadlines so frame cost does not accumulate as drift
+        t0 = time.perf_counter()
         for i in range(num_steps + 1):
+            if cancel_event.is_set():
+                return
+            
             t = i * time_step
             if t > movement_time:
                 t = movement_time
@@ -377,18 +718,42 @@ def move_joint_smooth():
             new_angle = profile(t)
             
             # Update only this joint while keeping others at current positions
-            new_joint_angles = current_joint_angles.copy()
-            new_joint_angles[joint_name] = new_angle
+            if joint_idx is not None:
+                joint_state.set_index(joint_idx, new_angle)
+            
+            # A client that joined since the last frame has nothing to apply deltas to,
+            # so every new connection starts over with a full frame
+            connections = get_connections_opened()
+            if connections != connections_seen:
+                prev_angles = None
+                connections_seen = connections
             
-            # Update current state
-            set_joint_angles(new_joint_angles)
+            # Without a UI attached only the joint state is kept current
+            if not has_connected_clients():
+                time.sleep(max(0.0, t0 + (i + 1) * time_step - time.perf_counter()))
+                continue
             
             # Calculate end effector pose
+            current_joint_angles = joint_state.as_dict()
             end_effector = calculate_end_effector_pose(current_joint_angles)
             
+            # Send the full joint state first, then only the joints that changed
+            angles = joint_state.angles.tolist()
+            is_delta = prev_angles is not None
+            if not is_delta:
+                joint_angles_update = current_joint_angles
+            else:
+                joint_angles_update = {
+                    name: angle for name, angle, prev in zip(joint_state.names, angles, prev_angles)
+                    if angle != prev
+                }
+            prev_angles = angles
+            
             # Prepare data for frontend
             frontend_data = {
-                'joint_angles': current_joint_angles,
+                'joint_angles': joint_angles_update,
+                'delta': is_delta,
+                'motion_id': motion_id,
                 'end_effector': end_effector,
                 'movement_progress': {
                     'joint_index': joint_index,
@@ -398,21 +763,25 @@ def move_joint_smooth():
                 }
             }
             
-            send_to_websocket(json.dumps(frontend_data))
-            time.sleep(time_step)
+            # Deltas only make sense on top of the full frame, so that one must not be dropped
+            send_to_websocket(orjson.dumps(frontend_data, option=orjson.OPT_SERIALIZE_NUMPY),
+                              reliable=not is_delta)
+            time.sleep(max(0.0, t0 + (i + 1) * time_step - time.perf_counter()))
         
         # Send final completion message
+        current_joint_angles = joint_state.as_dict()
         final_data = {
             'joint_angles': current_joint_angles,
+            'motion_id': motion_id,
             'end_effector': calculate_end_effector_pose(current_joint_angles),
             'movement_complete': True,
             'joint_index': joint_index
         }
-        send_to_websocket(json.dumps(final_data))
+        # The frontend keeps its sliders locked until this frame arrives
+        send_to_websocket(orjson.dumps(final_data, option=orjson.OPT_SERIALIZE_NUMPY), reliable=True)
     
-    # Run the movement in a background thread
-    thread = threading.Thread(target=smooth_movement_task)
-    thread.start()
+    # Run the movement on the motion worker, replacing any movement in progress
+    submit_motion(smooth_movement_task)
     
     return jsonify({
         "message": f"Smooth movement started for joint {joint_index} to {target_angle:.3f} radians",
@@ -421,19 +790,18 @@ def move_joint_smooth():
     })
 
 @app.route('/set_joints', methods=['POST'])
+@requires_robot
 def set_joints_endpoint():
     """
     API endpoint to set joint angles manually.
     """
-    global current_joint_angles
-    from flask import request
-    
-    data = request.get_json()
-    if not data or 'joints' not in data:
+    # Parsed by orjson through OrjsonProvider; this endpoint is hit on every slider drag
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'joints' not in data:
         return jsonify({"error": "Invalid request data"}), 400
     
     joints = data['joints']
-    if len(joints) != 6:
+    if not isinstance(joints, list) or len(joints) != 6:
         return jsonify({"error": "Expected 6 joint angles"}), 400
     
     # Map joint angles to joint names
@@ -452,6 +820,7 @@ def set_joints_endpoint():
     
     # Update current joint angles
     set_joint_angles(joint_angles)
+    current_joint_angles = joint_state.as_dict()
     
     # Calculate end effector pose
     end_effector = calculate_end_effector_pose(current_joint_angles)
@@ -465,11 +834,17 @@ def set_joints_endpoint():
     return jsonify(robot_state)
 
 @app.route('/robot_state', methods=['GET'])
+@requires_robot
 def get_robot_state():
     """
     API endpoint to get the current robot state including end effector pose.
     """
-    global current_joint_angles
+    # Let clients skip the response entirely while the state is unchanged
+    etag = f'{BOOT_ID}-{joint_state.generation}-{joint_state.version}'
+    if request.if_none_match.contains(etag):
+        return '', 304, {'ETag': f'"{etag}"'}
+    
+    current_joint_angles = joint_state.as_dict()
     
     # Calculate end effector pose
     end_effector = calculate_end_effector_pose(current_joint_angles)
@@ -480,50 +855,62 @@ def get_robot_state():
         'timestamp': time.time()
     }
     
-    return jsonify(robot_state)
+    response = jsonify(robot_state)
+    response.set_etag(etag)
+    return response
 
 @app.route('/move', methods=['POST'])
+@requires_robot
 def move_robot():
     """
     API endpoint to start the robot's movement sequence.
     """
-    from flask import request
-    
     # Get movement type from request (default to sinusoidal)
     data = request.get_json() if request.is_json else {}
     movement_type = data.get('movement_type', 'sinusoidal')
     
-    def movement_task():
+    def movement_task(cancel_event, motion_id):
         if movement_type == 'trapezoidal':
             sequence = generate_trapezoidal_movement_sequence()
         else:
             sequence = generate_movement_sequence()
-        execute_movement_sequence(sequence)
+        execute_movement_sequence(sequence, cancel_event, motion_id)
 
-    # Run the movement in a background thread to not block the API response
-    thread = threading.Thread(target=movement_task)
-    thread.start()
+    # Run the movement on the motion worker to not block the API response
+    submit_motion(movement_task)
 
     return jsonify({
         "message": f"Movement sequence started with {movement_type} interpolation."
     })
 
+# Only the timestamp of the health check body changes between calls
+HEALTH_PREFIX = b'{"status":"healthy","service":"robot-backend","timestamp":'
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """
     Health check endpoint for Docker containers.
     """
-    return jsonify({
-        "status": "healthy",
-        "timestamp": time.time(),
-        "service": "robot-backend"
-    })
+    return app.response_class(HEALTH_PREFIX + orjson.dumps(time.time()) + b'}', mimetype='application/json')
 
 if __name__ == '__main__':
+    print_path_info()
+    
+    # Load the robot before serving so the first request does not pay for the URDF parse
+    get_robot_arm()
+    
     # Start the WebSocket server in a background thread
     websocket_thread = threading.Thread(target=run_websocket_server)
     websocket_thread.daemon = True
     websocket_thread.start()
     
+    # Turn SIGTERM (e.g. docker stop) into a normal exit so the WebSocket server is shut down
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
     # Start the Flask app
-    app.run(debug=False, host='0.0.0.0', port=5000, use_reloader=False)
+    try:
+        app.run(debug=False, host='0.0.0.0', port=5000, use_reloader=False)
+    finally:
+        shutdown_motion_worker(timeout=5.0)
+        stop_websocket_server()
+        websocket_thread.join(timeout=5.0)
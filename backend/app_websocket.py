@@ -1,9 +1,53 @@
 import asyncio
+import collections
+import signal
+import threading
 import websockets
+from websockets import broadcast
 import json
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    # Fall back to the stdlib parser if orjson is not installed
+    json_loads = json.loads
+
+try:
+    import uvloop
+except ImportError:
+    # The server runs on the stdlib event loop if uvloop is not installed
+    uvloop = None
+
 # A set to store all connected WebSocket clients
 connected_clients = set()
+# Number of connections accepted since the server started; never goes down, so
+# a new client shows up even when another disconnected at the same time
+connections_opened = 0
+
+# Start of the acknowledgement sent back for every valid message
+RECEIVED_PREFIX = b'{"status":"received","data":'
+
+# Clients with more unsent bytes than this skip broadcasts until they catch up
+SEND_BUFFER_LIMIT = 1024 * 1024
+
+# The event loop the WebSocket server runs on, set once the server thread starts
+WS_LOOP = None
+
+# Set to shut the server down; created on the server loop in main()
+STOP_EVENT = None
+
+# Seconds to wait for a client's closing handshake before dropping the connection
+CLOSE_TIMEOUT = 1.0
+
+# Outgoing (message, reliable) frames waiting to be broadcast, in the order they were
+# queued. Once more than SEND_QUEUE_SIZE unreliable frames pile up the oldest of them
+# drops out; reliable frames, such as a whole trajectory, are never dropped.
+SEND_QUEUE_SIZE = 4
+SEND_QUEUE = collections.deque()
+# Guards SEND_QUEUE and flush_pending, which producers share with the server loop
+SEND_LOCK = threading.Lock()
+# True while a flush is scheduled on the server loop
+flush_pending = False
 
 def get_connected_clients_count():
     """
@@ -11,24 +55,90 @@ def get_connected_clients_count():
     """
     return len(connected_clients)
 
+def get_connections_opened():
+    """
+    Returns the number of client connections accepted so far.
+    """
+    return connections_opened
+
 def has_connected_clients():
     """
     Returns True if there are connected clients.
     """
     return len(connected_clients) > 0
 
+def flush_send_queue():
+    """
+    Broadcasts every queued message in order. Consecutive unreliable messages are
+    merged into one batch; reliable messages go out on their own to every client.
+    Runs on the server loop.
+    """
+    global flush_pending
+    with SEND_LOCK:
+        # Clear the flag with the queue so a frame queued during the flush schedules a new one
+        flush_pending = False
+        entries = list(SEND_QUEUE)
+        SEND_QUEUE.clear()
+    
+    messages = []
+    for message, reliable in entries:
+        if not reliable:
+            messages.append(message)
+            continue
+        # Frames queued before the reliable one must not arrive after it
+        if messages:
+            send_to_all(merge_messages(messages))
+            messages = []
+        send_to_all(message, reliable=True)
+    if messages:
+        send_to_all(merge_messages(messages))
+
+def queue_message(message, reliable=False):
+    """
+    Queues a message for all connected clients from any thread.
+    Only the first frame queued since the last flush wakes up the server loop.
+    A reliable message is never dropped from the queue and is not skipped for
+    lagging clients. Returns False if the server is not running.
+    """
+    global flush_pending
+    loop = WS_LOOP
+    if loop is None or not loop.is_running():
+        return False
+    with SEND_LOCK:
+        SEND_QUEUE.append((message, reliable))
+        if not reliable:
+            # Drop the oldest unreliable frame once too many are waiting
+            unreliable = [i for i, (_, queued_reliable) in enumerate(SEND_QUEUE) if not queued_reliable]
+            if len(unreliable) > SEND_QUEUE_SIZE:
+                del SEND_QUEUE[unreliable[0]]
+        wake = not flush_pending
+        flush_pending = True
+    if wake:
+        loop.call_soon_threadsafe(flush_send_queue)
+    return True
+
+def merge_messages(messages):
+    """
+    Merges JSON messages into a single {"batch": [...]} document.
+    A single message is returned unchanged.
+    """
+    if len(messages) == 1:
+        return messages[0]
+    parts = [m.encode('utf-8') if isinstance(m, str) else m for m in messages]
+    return b'{"batch":[' + b','.join(parts) + b']}'
+
 async def handle_message(websocket, message):
     """
     Handle incoming WebSocket messages
     """
     try:
-        data = json.loads(message)
+        data = json_loads(message)
         # Handle different message types here if needed
         print(f"Received WebSocket message: {data}")
         
-        # Echo back or process the message
-        response = {"status": "received", "data": data}
-        await websocket.send(json.dumps(response))
+        # Echo back the already-serialized message instead of re-encoding the parsed data
+        raw = message.encode('utf-8') if isinstance(message, str) else message
+        await websocket.send(RECEIVED_PREFIX + raw + b'}')
     except json.JSONDecodeError:
         print(f"Invalid JSON received: {message}")
     except Exception as e:
@@ -38,8 +148,9 @@ async def register(websocket):
     """
     Adds a new client to the set of connected clients.
     """
-    global connected_clients
+    global connected_clients, connections_opened
     connected_clients.add(websocket)
+    connections_opened += 1
     print(f"New client connected. Total clients: {len(connected_clients)}")
     try:
         # Listen for messages from this client
@@ -54,45 +165,82 @@ async def register(websocket):
         connected_clients.discard(websocket)
         print(f"Client disconnected. Total clients: {len(connected_clients)}")
 
-async def send_to_all(message):
+def send_to_all(message, reliable=False):
     """
     Sends a message to all connected clients.
+    The frame is written to every open connection without awaiting each send;
+    clients that stopped reading skip messages until their buffer drains,
+    unless the message is reliable.
     """
-    global connected_clients
     if not connected_clients:
         return
-        
-    # Create a copy of the set to avoid modification during iteration
-    clients_copy = connected_clients.copy()
-    disconnected = set()
     
-    for client in clients_copy:
-        try:
-            await client.send(message)
-        except websockets.exceptions.ConnectionClosed:
-            disconnected.add(client)
-        except Exception as e:
-            print(f"Error sending to client: {e}")
-            disconnected.add(client)
+    if reliable:
+        broadcast(connected_clients, message)
+        return
     
-    # Remove disconnected clients
-    connected_clients -= disconnected
+    broadcast(
+        (client for client in connected_clients
+         if client.transport.get_write_buffer_size() <= SEND_BUFFER_LIMIT),
+        message
+    )
+
+async def close_all_clients():
+    """
+    Closes every open connection so shutdown does not wait on idle clients.
+    Each close gives up after CLOSE_TIMEOUT if the client does not answer.
+    """
+    clients = list(connected_clients)
+    if clients:
+        await asyncio.gather(
+            *(client.close(1001, "Server shutting down") for client in clients),
+            return_exceptions=True
+        )
 
 async def main():
     """
     Starts the WebSocket server.
     """
+    global STOP_EVENT
+    STOP_EVENT = asyncio.Event()
     host = "0.0.0.0"  # Bind to all interfaces for Docker
     port = 8765
     print(f"Starting WebSocket server on ws://{host}:{port}")
-    async with websockets.serve(register, host, port):
-        await asyncio.Future()  # Run forever
+    async with websockets.serve(register, host, port, close_timeout=CLOSE_TIMEOUT):
+        await STOP_EVENT.wait()  # Run until stop_server() is called
+        await close_all_clients()
+    print("WebSocket server stopped")
+
+def stop_server():
+    """
+    Asks the WebSocket server to shut down. Safe to call from any thread.
+    Returns False if the server is not running.
+    """
+    loop = WS_LOOP
+    if loop is None or STOP_EVENT is None or not loop.is_running():
+        return False
+    loop.call_soon_threadsafe(STOP_EVENT.set)
+    return True
 
 def run_server():
     """
     Runs the WebSocket server in a separate thread.
+    The loop is kept in WS_LOOP so other threads can queue sends on it.
+    Uses a uvloop loop when uvloop is available.
     """
-    asyncio.run(main())
+    global WS_LOOP
+    WS_LOOP = uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+    asyncio.set_event_loop(WS_LOOP)
+    # Signal handlers can only be installed from the main thread
+    if threading.current_thread() is threading.main_thread():
+        try:
+            WS_LOOP.add_signal_handler(signal.SIGTERM, stop_server)
+        except NotImplementedError:
+            pass
+    try:
+        WS_LOOP.run_until_complete(main())
+    finally:
+        WS_LOOP.close()
 
 if __name__ == "__main__":
     run_server()
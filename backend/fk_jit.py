@@ -0,0 +1,89 @@
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # Run the jitted code as plain Python if numba is not installed
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# Joint type codes used by the kernel; continuous joints move like revolute ones
+JOINT_FIXED = 0
+JOINT_REVOLUTE = 1
+JOINT_PRISMATIC = 2
+
+# Static chain data and cached poses are stored in single precision; the angles
+# and trigonometry stay in double so repeated poses still compare exactly
+FK_DTYPE = np.float32
+
+JOINT_TYPE_CODES = {
+    'fixed': JOINT_FIXED,
+    'revolute': JOINT_REVOLUTE,
+    'continuous': JOINT_REVOLUTE,
+    'prismatic': JOINT_PRISMATIC,
+}
+
+def pack_chain(chain):
+    """
+    Packs (joint_name, joint_type, origin, axis) chain tuples into the contiguous
+    (origins, axes, joint_types) arrays the kernel works on.
+    """
+    origins = np.ascontiguousarray([origin for _, _, origin, _ in chain], dtype=FK_DTYPE).reshape(-1, 4, 4)
+    axes = np.ascontiguousarray([axis for _, _, _, axis in chain], dtype=FK_DTYPE).reshape(-1, 3)
+    joint_types = np.array([JOINT_TYPE_CODES[joint_type] for _, joint_type, _, _ in chain], dtype=np.int64)
+    return origins, axes, joint_types
+
+@njit(cache=True, fastmath=True)
+def _mul4(a, b, out):
+    """
+    Writes the product of two 4x4 matrices into out.
+    """
+    for i in range(4):
+        for j in range(4):
+            out[i, j] = a[i, 0] * b[0, j] + a[i, 1] * b[1, j] + a[i, 2] * b[2, j] + a[i, 3] * b[3, j]
+
+@njit(cache=True, fastmath=True)
+def chain_prefix_poses(q, origins, axes, joint_types, prefix, start):
+    """
+    Fills prefix[i] with the base to joint i child pose for every i >= start,
+    reusing prefix[start - 1], and returns the pose at the end of the chain.
+    """
+    motion = np.empty((4, 4), dtype=prefix.dtype)
+    joint = np.empty((4, 4), dtype=prefix.dtype)
+    pose = np.empty((4, 4), dtype=prefix.dtype)
+    if start > 0:
+        pose[:, :] = prefix[start - 1]
+    else:
+        pose[:, :] = np.eye(4)
+
+    for i in range(start, q.shape[0]):
+        if joint_types[i] == JOINT_FIXED or q[i] == 0.0:
+            joint[:, :] = origins[i]
+        else:
+            motion[:, :] = np.eye(4)
+            x, y, z = axes[i, 0], axes[i, 1], axes[i, 2]
+            if joint_types[i] == JOINT_PRISMATIC:
+                motion[0, 3] = x * q[i]
+                motion[1, 3] = y * q[i]
+                motion[2, 3] = z * q[i]
+            else:
+                # Rodrigues' formula for a unit axis: R = cI + sK + (1 - c) * a a^T
+                s = np.sin(q[i])
+                c = np.cos(q[i])
+                t = 1.0 - c
+                motion[0, 0] = c + t * x * x
+                motion[0, 1] = t * x * y - s * z
+                motion[0, 2] = t * x * z + s * y
+                motion[1, 0] = t * x * y + s * z
+                motion[1, 1] = c + t * y * y
+                motion[1, 2] = t * y * z - s * x
+                motion[2, 0] = t * x * z - s * y
+                motion[2, 1] = t * y * z + s * x
+                motion[2, 2] = c + t * z * z
+            _mul4(origins[i], motion, joint)
+        _mul4(pose, joint, prefix[i])
+        pose[:, :] = prefix[i]
+
+    return pose
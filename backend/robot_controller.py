@@ -4,17 +4,194 @@ import time
 import random  # For simulating variations
 import json
 import queue
-from urdfpy import URDF
-import pyrender
-from PIL import Image
+import numpy as np
 import os
+import functools
+import atexit
+import hashlib
+import pickle
+import stat
+import tempfile
+
+
+def _urdf_cache_dir():
+    """
+    Returns a private per-user directory for parsed URDF caches, or None if it is unsafe.
+
+    Cached models are unpickled, so the directory must belong to the current user and
+    must not be writable by anyone else; otherwise the cache is not used.
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    cache_dir = os.path.join(base, 'robot_controller')
+    try:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        st = os.lstat(cache_dir)
+    except OSError as e:
+        print(f"URDF cache disabled: {e}")
+        return None
+    if not stat.S_ISDIR(st.st_mode) or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH) \
+            or (hasattr(os, 'getuid') and st.st_uid != os.getuid()):
+        print(f"URDF cache disabled: {cache_dir} is not a private directory")
+        return None
+    return cache_dir
+
+
+def _is_private_file(path):
+    """
+    Returns True if path is a regular file owned by the current user and not writable by others.
+    """
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISREG(st.st_mode) and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH) \
+        and (not hasattr(os, 'getuid') or st.st_uid == os.getuid())
+
+
+def _load_urdf_cached(path):
+    """
+    Loads a URDF, reusing a pickled copy of the parsed model while the file is unchanged.
+
+    Parsing the XML and meshes dominates startup, so the parsed URDF is stored in a
+    private per-user cache directory keyed on the file's path, size and modification
+    time in nanoseconds. Entries for older versions of the file are removed.
+    """
+    from urdfpy import URDF
+
+    cache_dir = _urdf_cache_dir()
+    if cache_dir is None:
+        return URDF.load(path)
+
+    st = os.stat(path)
+    key = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()
+    cache_path = os.path.join(cache_dir, f"urdf_{key}_{st.st_mtime_ns}_{st.st_size}.pkl")
+
+    if _is_private_file(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            print(f"Ignoring unreadable URDF cache {cache_path}: {e}")
+
+    robot = URDF.load(path)
+    tmp_path = None
+    try:
+        # Write to a private temp file and rename so readers never see a partial pickle
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(robot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except (OSError, pickle.PicklingError) as e:
+        print(f"Could not write URDF cache {cache_path}: {e}")
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    else:
+        _remove_stale_caches(cache_dir, f"urdf_{key}_", cache_path)
+    return robot
+
+
+def _remove_stale_caches(cache_dir, prefix, keep):
+    """
+    Removes cached pickles of an older version of the same URDF, keeping only keep.
+    """
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(cache_dir, name)
+        if name.startswith(prefix) and name.endswith('.pkl') and path != keep:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Could not remove stale URDF cache {path}: {e}")
+
 
-# Create a single instance of the robot arm
 robot_model_file_path = "/home/pouri/workspace/Assignment_Sereact/urdfpy/tests/data/ur5/ur5.urdf"
-robot_arm = URDF.load(robot_model_file_path)
 
-# Initialize the current position of the robot arm
-current_joint_angles = {joint.name: 0.0 for joint in robot_arm.joints if joint.joint_type != 'fixed'}
+
+@functools.lru_cache(maxsize=None)
+def get_robot_arm():
+    """
+    Returns the single instance of the robot arm, loading it on first use
+    so importing this module stays cheap.
+    """
+    return _load_urdf_cached(robot_model_file_path)
+
+
+@functools.lru_cache(maxsize=None)
+def _joint_tables():
+    """
+    Returns (joints_by_name, non_fixed_joints, joint_limits) for the robot arm.
+
+    Built once so lookups do not scan robot_arm.joints; joint_limits maps each
+    non-fixed joint to (lower, upper), with None where the URDF gives no limit.
+    """
+    joints = get_robot_arm().joints
+    joints_by_name = {joint.name: joint for joint in joints}
+    non_fixed_joints = [joint for joint in joints if joint.joint_type != 'fixed']
+    joint_limits = {
+        joint.name: (joint.limit.lower, joint.limit.upper) if joint.limit is not None else (None, None)
+        for joint in non_fixed_joints
+    }
+    return joints_by_name, non_fixed_joints, joint_limits
+
+
+# Current position of the robot arm; starts at the zero pose on first use
+current_joint_angles = {}
+
+
+# Offscreen renderer and scene reused across calls; created on the first render
+_renderer = None
+_scene = None
+_robot_nodes = {}
+
+_IMG_PATH = os.path.join(os.path.dirname(__file__), 'robot_pose.png')
+
+
+def _close_renderer():
+    """
+    Releases the offscreen renderer's OpenGL context at interpreter exit.
+    """
+    if _renderer is not None:
+        _renderer.delete()
+
+
+atexit.register(_close_renderer)
+
+
+def _get_render_scene(joint_angles):
+    """
+    Returns the persistent renderer and scene with the robot posed at joint_angles.
+
+    The scene is built once with one node per visual mesh; later calls only move
+    those nodes to the new link poses.
+    """
+    global _renderer, _scene
+    import pyrender
+
+    mesh_poses = get_robot_arm().visual_trimesh_fk(cfg=joint_angles)
+
+    if _scene is None:
+        scene = pyrender.Scene()
+        for mesh, pose in mesh_poses.items():
+            _robot_nodes[mesh] = scene.add(pyrender.Mesh.from_trimesh(mesh, smooth=False), pose=pose)
+        _scene = scene
+    else:
+        for mesh, pose in mesh_poses.items():
+            _scene.set_pose(_robot_nodes[mesh], pose)
+
+    if _renderer is None:
+        _renderer = pyrender.OffscreenRenderer(viewport_width=640, viewport_height=480)
+
+    return _renderer, _scene
+
+
+def get_joint(joint_name):
+    """
+    Returns the URDF joint with the given name, or None if it does not exist.
+    """
+    return _joint_tables()[0].get(joint_name)
 
 
 def set_joint_angles(joint_angles):
@@ -26,6 +203,8 @@ def set_joint_angles(joint_angles):
                              values are the desired angles in radians.
     """
     global current_joint_angles
+    if not current_joint_angles:
+        current_joint_angles.update((joint.name, 0.0) for joint in _joint_tables()[1])
     # You can now use the 'joint_angles' dictionary to control the robot arm
     # (e.g., send the angles to the robot's controller)
     print("\nSetting joint angles:")
@@ -45,43 +224,47 @@ def calculate_and_display_fk(joint_angles):
 
     Args:
         joint_angles (dict): A dictionary of joint angles.
+
+    Returns:
+        numpy.ndarray: Contiguous float64 array of shape (N, 3) with the position
+                       of each link in robot_arm.links that has a pose.
     """
+    robot_arm = get_robot_arm()
+
     # Calculate forward kinematics for all links
     fk_results = robot_arm.link_fk(cfg=joint_angles)
 
+    # Stack the poses so all positions come out of one slice
+    links = [link for link in robot_arm.links if link in fk_results]
+    poses = np.stack([fk_results[link] for link in links]) if links else np.empty((0, 4, 4))
+    # The position is in the last column of each 4x4 matrix
+    positions = np.ascontiguousarray(poses[:, :3, 3], dtype=np.float64)
+
     print("\nForward Kinematics (Cartesian Positions):")
-    for link in robot_arm.links:
-        pose_matrix = fk_results.get(link)
-        if pose_matrix is not None:
-            # The position is in the last column of the 4x4 matrix
-            position = pose_matrix[:3, 3]
-            print(f"- {link.name}: (x={position[0]:.4f}, y={position[1]:.4f}, z={position[2]:.4f})")
+    for link, (x, y, z) in zip(links, positions.tolist()):
+        print(f"- {link.name}: (x={x:.4f}, y={y:.4f}, z={z:.4f})")
 
     # Offscreen rendering
     try:
-        # Create a scene with the specified joint configuration
-        scene = pyrender.Scene.from_trimesh(robot_arm.visual_trimesh(cfg=joint_angles))
-
-        # Create an offscreen renderer
-        renderer = pyrender.OffscreenRenderer(viewport_width=640, viewport_height=480)
+        # Pose the persistent scene with the specified joint configuration
+        renderer, scene = _get_render_scene(joint_angles)
         
         # Render the scene
         color, depth = renderer.render(scene)
         
         # Save the image
+        from PIL import Image
         img = Image.fromarray(color)
-        image_path = os.path.join(os.path.dirname(__file__), 'robot_pose.png')
-        img.save(image_path)
+        img.save(_IMG_PATH)
         
-        print(f"\nRobot visualization saved to: {image_path}")
-
-        # Clean up the renderer
-        renderer.delete()
+        print(f"\nRobot visualization saved to: {_IMG_PATH}")
 
     except Exception as e:
         print(f"\nCould not generate visualization. Error: {e}")
         print("This might be due to a missing display environment. The forward kinematics data is still correct.")
 
+    return positions
+
 
 def get_joint_angles_from_user():
     """
@@ -90,28 +273,30 @@ def get_joint_angles_from_user():
     """
     # Create a dictionary to store the desired joint angles
     joint_angles = {}
+    _, non_fixed_joints, joint_limits = _joint_tables()
 
     # Iterate through the joints and get user input for each one
-    for joint in robot_arm.joints:
-        if joint.joint_type != 'fixed':
-            while True:
-                try:
-                    limit_info = ""
-                    if joint.limit is not None:
-                        limit_info = f" (limits: {joint.limit.lower:.2f} to {joint.limit.upper:.2f})"
-                    
-                    angle_str = input(f"Enter the desired angle for joint '{joint.name}' in radians{limit_info}: ")
-                    angle = float(angle_str)
-
-                    if joint.limit is not None:
-                        if not (joint.limit.lower <= angle <= joint.limit.upper):
-                            print(f"Error: Angle for joint '{joint.name}' is outside its limits. Please enter a value between {joint.limit.lower:.2f} and {joint.limit.upper:.2f}.")
-                            continue
-                    
-                    joint_angles[joint.name] = angle
-                    break
-                except ValueError:
-                    print("Invalid input. Please enter a valid number.")
+    for joint in non_fixed_joints:
+        lower, upper = joint_limits[joint.name]
+        has_limits = lower is not None and upper is not None
+        while True:
+            try:
+                limit_info = ""
+                if has_limits:
+                    limit_info = f" (limits: {lower:.2f} to {upper:.2f})"
+                
+                angle_str = input(f"Enter the desired angle for joint '{joint.name}' in radians{limit_info}: ")
+                angle = float(angle_str)
+
+                if has_limits:
+                    if not (lower <= angle <= upper):
+                        print(f"Error: Angle for joint '{joint.name}' is outside its limits. Please enter a value between {lower:.2f} and {upper:.2f}.")
+                        continue
+                
+                joint_angles[joint.name] = angle
+                break
+            except ValueError:
+                print("Invalid input. Please enter a valid number.")
     return joint_angles
 
 
@@ -114,6 +114,7 @@ def check_test_files():
     test_files = [
         "tests/test_app.py",
         "tests/test_websocket.py",
+        "tests/test_robot_controller.py",
         "tests/conftest.py",
         "tests/pytest.ini"
     ]
@@ -117,22 +117,23 @@ def mock_websocket_functions():
     """
     Mock WebSocket related functions.
     """
-    with patch('app.send_to_all') as mock_send_all, \
+    with patch('app.queue_message') as mock_queue_message, \
          patch('app.has_connected_clients') as mock_has_clients, \
          patch('app.run_websocket_server') as mock_run_server:
         
         mock_has_clients.return_value = True
         yield {
-            'send_to_all': mock_send_all,
+            'queue_message': mock_queue_message,
             'has_connected_clients': mock_has_clients,
             'run_websocket_server': mock_run_server
         }
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def flask_app():
     """
-    Create and configure a Flask app for testing.
+    Configure the Flask app for testing once per module.
+    The per-test state is reset by reset_joint_angles.
     """
     # This will be imported after the URDF mocking is in place
     import app
@@ -141,23 +142,13 @@ def flask_app():
     app.app.config['TESTING'] = True
     app.app.config['WTF_CSRF_ENABLED'] = False
     
-    # Initialize test joint angles
-    app.current_joint_angles = {
-        'shoulder_pan_joint': 0.0,
-        'shoulder_lift_joint': 0.0,
-        'elbow_joint': 0.0,
-        'wrist_1_joint': 0.0,
-        'wrist_2_joint': 0.0,
-        'wrist_3_joint': 0.0
-    }
-    
     return app.app
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def client(flask_app):
     """
-    Create a test client for the Flask app.
+    Create a test client for the Flask app, shared by the tests of a module.
     """
     with flask_app.test_client() as client:
         yield client
@@ -171,15 +162,20 @@ def reset_joint_angles():
     """
     # Import app here to ensure mocking is in place
     import app
+    from tests.fakes import FakeJoint, FakeRobot
     
-    app.current_joint_angles = {
-        'shoulder_pan_joint': 0.0,
-        'shoulder_lift_joint': 0.0,
-        'elbow_joint': 0.0,
-        'wrist_1_joint': 0.0,
-        'wrist_2_joint': 0.0,
-        'wrist_3_joint': 0.0
-    }
+    joint_names = [
+        'shoulder_pan_joint', 'shoulder_lift_joint', 'elbow_joint',
+        'wrist_1_joint', 'wrist_2_joint', 'wrist_3_joint'
+    ]
+    
+    # Mark the robot as loaded so endpoints do not rebuild the joint state below
+    app.robot_arm = FakeRobot(joints=[FakeJoint(name) for name in joint_names])
+    app.ACTUATED_JOINT_NAMES = tuple(joint_names)
+    app.joint_state = app.JointState(joint_names)
+    
+    # Drop end effector poses cached by earlier tests with a different robot mock
+    app._ee_pose_cached.cache_clear()
     
     yield
     
@@ -0,0 +1,59 @@
+"""
+Lightweight stand-ins for the urdfpy objects used by the backend tests.
+
+Plain classes with hand-written __slots__ keep attribute access cheap and still
+run on Python 3.8, where dataclass(slots=True) is not available. They keep
+identity hashing so links can be used as link_fk result keys.
+"""
+
+import numpy as np
+
+
+class FakeLink:
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeJoint:
+    __slots__ = ('name', 'joint_type', 'parent', 'child', 'axis', 'origin', 'mimic')
+
+    def __init__(self, name, joint_type="revolute", parent=None, child=None,
+                 axis=None, origin=None, mimic=None):
+        self.name = name
+        self.joint_type = joint_type
+        self.parent = parent
+        self.child = child
+        self.axis = np.array([0.0, 0.0, 1.0]) if axis is None else axis
+        self.origin = np.eye(4) if origin is None else origin
+        self.mimic = mimic
+
+
+class FakeRobot:
+    __slots__ = ('joints', 'links', 'link_fk_return', 'link_fk_error', 'link_fk_calls',
+                 'link_fk_cfgs', 'link_fk_batch_return', 'link_fk_batch_calls')
+
+    def __init__(self, joints=None, links=None, link_fk_return=None, link_fk_error=None,
+                 link_fk_batch_return=None):
+        self.joints = [] if joints is None else joints
+        self.links = [] if links is None else links
+        self.link_fk_return = {} if link_fk_return is None else link_fk_return
+        self.link_fk_error = link_fk_error
+        self.link_fk_calls = 0
+        self.link_fk_cfgs = []
+        self.link_fk_batch_return = {} if link_fk_batch_return is None else link_fk_batch_return
+        self.link_fk_batch_calls = []
+
+    def link_fk(self, cfg=None):
+        """Returns the configured poses, or raises link_fk_error, and records the configuration."""
+        self.link_fk_calls += 1
+        self.link_fk_cfgs.append(cfg)
+        if self.link_fk_error is not None:
+            raise self.link_fk_error
+        return self.link_fk_return
+
+    def link_fk_batch(self, cfgs=None):
+        """Returns the configured batched poses and records the configurations."""
+        self.link_fk_batch_calls.append(cfgs)
+        return self.link_fk_batch_return
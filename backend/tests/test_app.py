@@ -3,7 +3,7 @@ import json
 import time
 import math
 import threading
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import patch
 import numpy as np
 from flask import Flask
 
@@ -18,6 +18,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 with patch('urdfpy.URDF'):
     import app
 
+from tests.fakes import FakeJoint, FakeLink, FakeRobot
+
 
 class TestUtilityFunctions:
     """Test utility functions that don't depend on Flask app context."""
@@ -35,24 +37,19 @@ class TestUtilityFunctions:
         
         with patch('app.has_connected_clients', return_value=True), \
              patch('asyncio.new_event_loop') as mock_loop_create, \
-             patch('asyncio.set_event_loop') as mock_set_loop, \
-             patch('app.send_to_all') as mock_send_all:
-            
-            mock_loop = Mock()
-            mock_loop_create.return_value = mock_loop
+             patch('app.queue_message') as mock_queue:
             
             # Should not raise an error
             app.send_to_websocket(mock_data)
             
-            mock_loop_create.assert_called_once()
-            mock_set_loop.assert_called_once_with(mock_loop)
-            mock_loop.run_until_complete.assert_called_once()
-            mock_loop.close.assert_called_once()
+            # The frame is queued on the server's loop
+            mock_queue.assert_called_once_with(mock_data, reliable=False)
+            mock_loop_create.assert_not_called()
 
     def test_send_to_websocket_exception_handling(self):
-        """Test send_to_websocket handles exceptions gracefully."""
+        """Test send_to_websocket ignores a server loop that closed under it."""
         with patch('app.has_connected_clients', return_value=True), \
-             patch('asyncio.new_event_loop', side_effect=Exception("Test error")):
+             patch('app.queue_message', side_effect=RuntimeError("Event loop is closed")):
             
             # Should not raise an error even when exception occurs
             result = app.send_to_websocket({"test": "data"})
@@ -60,22 +57,8 @@ class TestUtilityFunctions:
 
     def test_generate_movement_sequence(self):
         """Test the generation of movement sequence."""
-        with patch.object(app, 'robot_arm') as mock_robot_arm:
-            # Mock robot joints
-            mock_joint1 = Mock()
-            mock_joint1.name = "joint1"
-            mock_joint1.joint_type = "revolute"
-            
-            mock_joint2 = Mock()
-            mock_joint2.name = "joint2"
-            mock_joint2.joint_type = "revolute"
-            
-            mock_fixed_joint = Mock()
-            mock_fixed_joint.name = "fixed_joint"
-            mock_fixed_joint.joint_type = "fixed"
-            
-            mock_robot_arm.joints = [mock_joint1, mock_joint2, mock_fixed_joint]
-            
+        # Only the actuated joints resolved at startup are moved
+        with patch.object(app, 'ACTUATED_JOINT_NAMES', ("joint1", "joint2")):
             sequence = app.generate_movement_sequence()
             
             # Should return a list of 100 steps
@@ -151,22 +134,21 @@ class TestUtilityFunctions:
         assert profile_func(0.0) == 0.0
         assert abs(profile_func(1.0) - 1.0) < 1e-6
 
+    def test_trapezoidal_profile_array(self):
+        """Test the profile evaluates an array of times in one call."""
+        profile_func = app.trapezoidal_profile(0.0, 1.0, 2.0, 0.5)
+        times = np.linspace(-0.5, 2.5, 31)
+
+        positions = profile_func(times)
+        assert positions.shape == times.shape
+        assert np.allclose(positions, [profile_func(float(t)) for t in times])
+
     def test_generate_trapezoidal_movement_sequence(self):
         """Test the generation of trapezoidal movement sequence."""
-        with patch.object(app, 'robot_arm') as mock_robot_arm:
-            # Mock robot joints
-            mock_joints = []
-            joint_names = ['shoulder_pan_joint', 'shoulder_lift_joint', 'elbow_joint', 
-                          'wrist_1_joint', 'wrist_2_joint', 'wrist_3_joint']
-            
-            for name in joint_names:
-                mock_joint = Mock()
-                mock_joint.name = name
-                mock_joint.joint_type = "revolute"
-                mock_joints.append(mock_joint)
-            
-            mock_robot_arm.joints = mock_joints
-            
+        joint_names = ['shoulder_pan_joint', 'shoulder_lift_joint', 'elbow_joint', 
+                      'wrist_1_joint', 'wrist_2_joint', 'wrist_3_joint']
+        
+        with patch.object(app, 'ACTUATED_JOINT_NAMES', tuple(joint_names)):
             sequence = app.generate_trapezoidal_movement_sequence()
             
             # Should return a list of steps (100 steps for 10 seconds at 0.1 step)
@@ -179,6 +161,15 @@ class TestUtilityFunctions:
                     assert joint_name in step
                     assert isinstance(step[joint_name], (int, float))
 
+    def test_generate_trapezoidal_movement_sequence_matches_profile(self):
+        """Test the vectorized sequence matches the scalar trapezoidal profile."""
+        with patch.object(app, 'ACTUATED_JOINT_NAMES', ('elbow_joint',)):
+            sequence = app.generate_trapezoidal_movement_sequence()
+            profile_func = app.trapezoidal_profile(0.0, math.pi / 2, 10.0, 2.0)
+
+            for i, step in enumerate(sequence):
+                assert abs(step['elbow_joint'] - profile_func(i * 0.1)) < 1e-9
+
     def test_calculate_end_effector_pose_success(self):
         """Test successful end effector pose calculation."""
         joint_angles = {
@@ -190,23 +181,24 @@ class TestUtilityFunctions:
             'wrist_3_joint': 0.6
         }
         
-        # Mock the robot arm and forward kinematics
-        with patch.object(app, 'robot_arm') as mock_robot_arm:
-            # Create a mock pose matrix
-            mock_pose = np.array([
-                [1.0, 0.0, 0.0, 1.5],
-                [0.0, 1.0, 0.0, 2.0],
-                [0.0, 0.0, 1.0, 3.0],
-                [0.0, 0.0, 0.0, 1.0]
-            ])
-            
-            mock_link = Mock()
-            mock_link.name = "wrist_3_link"
-            
-            mock_robot_arm.link_fk.return_value = {mock_link: mock_pose}
-            
+        # Fake the robot arm and forward kinematics
+        mock_link = FakeLink("wrist_3_link")
+        other_link = FakeLink("base_link")
+        mock_pose = np.array([
+            [1.0, 0.0, 0.0, 1.5],
+            [0.0, 1.0, 0.0, 2.0],
+            [0.0, 0.0, 1.0, 3.0],
+            [0.0, 0.0, 0.0, 1.0]
+        ])
+        fake_robot = FakeRobot(link_fk_return={mock_link: mock_pose, other_link: np.eye(4)})
+        
+        with patch.object(app, 'robot_arm', fake_robot), \
+             patch.object(app, 'EE_LINK', mock_link):
             result = app.calculate_end_effector_pose(joint_angles)
             
+            # The requested angles reach forward kinematics
+            assert fake_robot.link_fk_cfgs == [joint_angles]
+            
             assert 'position' in result
             assert 'orientation' in result
             assert len(result['position']) == 3
@@ -216,14 +208,152 @@ class TestUtilityFunctions:
             assert result['position'][0] == 1.5
             assert result['position'][1] == 2.0
             assert result['position'][2] == 3.0
+            
+            # Identity rotation gives zero Euler angles
+            assert result['orientation'] == [0.0, 0.0, 0.0]
+
+    def test_calculate_end_effector_pose_cached(self):
+        """Test repeated poses for the same joint angles reuse the cached result."""
+        mock_link = FakeLink("wrist_3_link")
+        fake_robot = FakeRobot(link_fk_return={mock_link: np.eye(4)})
+        
+        with patch.object(app, 'robot_arm', fake_robot), \
+             patch.object(app, 'EE_LINK', mock_link), \
+             patch.object(app, 'ACTUATED_JOINT_NAMES', ('joint1', 'joint2')):
+            first = app.calculate_end_effector_pose({'joint1': 0.1, 'joint2': 0.2})
+            second = app.calculate_end_effector_pose({'joint1': 0.1 + 1e-9, 'joint2': 0.2})
+            assert first == second
+            assert fake_robot.link_fk_calls == 1
+            
+            app.calculate_end_effector_pose({'joint1': 0.3, 'joint2': 0.2})
+            assert fake_robot.link_fk_calls == 2
+
+    def test_resolve_end_effector_link(self):
+        """Test the end effector link is resolved by name with a last-link fallback."""
+        links = [FakeLink(name) for name in ['base_link', 'wrist_3_link', 'ee_link']]
+        
+        mock_robot = FakeRobot(links=links)
+        assert app.resolve_end_effector_link(mock_robot) is links[1]
+        
+        mock_robot.links = links[:1]
+        assert app.resolve_end_effector_link(mock_robot) is links[0]
+        
+        mock_robot.links = []
+        assert app.resolve_end_effector_link(mock_robot) is None
+
+    def test_get_robot_arm_loads_once(self):
+        """Test the URDF is loaded on first use and the derived state is set up."""
+        fake_robot = FakeRobot(
+            joints=[FakeJoint("joint1"), FakeJoint("base_joint", joint_type="fixed")],
+            links=[FakeLink("base_link"), FakeLink("wrist_3_link")]
+        )
+
+        with patch.object(app, 'robot_arm', None), \
+             patch.object(app, 'ACTUATED_JOINT_NAMES', ()), \
+             patch.object(app, 'EE_LINK', None), \
+             patch.object(app, 'joint_state', app.joint_state), \
+             patch.object(app, 'fk_cache', app.fk_cache), \
+             patch('app.URDF') as mock_urdf:
+            mock_urdf.load.return_value = fake_robot
+
+            assert app.get_robot_arm() is fake_robot
+            assert app.get_robot_arm() is fake_robot
+            mock_urdf.load.assert_called_once()
+            assert app.ACTUATED_JOINT_NAMES == ("joint1",)
+            assert app.joint_state.names == ("joint1",)
+            assert app.EE_LINK is fake_robot.links[1]
+
+    def test_get_robot_arm_clears_cached_poses(self):
+        """Test poses cached before the robot is loaded are dropped when it loads."""
+        stale_link = FakeLink("wrist_3_link")
+        stale_robot = FakeRobot(link_fk_return={stale_link: np.eye(4)})
+        fake_robot = FakeRobot(joints=[FakeJoint("joint1")], links=[FakeLink("wrist_3_link")])
+
+        with patch.object(app, 'robot_arm', stale_robot), \
+             patch.object(app, 'ACTUATED_JOINT_NAMES', ('joint1',)), \
+             patch.object(app, 'EE_LINK', stale_link), \
+             patch.object(app, 'joint_state', app.joint_state), \
+             patch.object(app, 'fk_cache', app.fk_cache), \
+             patch('app.URDF') as mock_urdf:
+            mock_urdf.load.return_value = fake_robot
+
+            app.calculate_end_effector_pose({'joint1': 0.0})
+            assert app._ee_pose_cached.cache_info().currsize == 1
+
+            app.robot_arm = None
+            app.get_robot_arm()
+            assert app._ee_pose_cached.cache_info().currsize == 0
+
+    def test_fk_cache_end_effector_pose(self):
+        """Test the cached chain forward kinematics on a simple planar arm."""
+        links = [FakeLink(name) for name in ['base_link', 'upper_link', 'wrist_3_link']]
+
+        joints = []
+        for name, parent, child, x in [('joint1', 'base_link', 'upper_link', 0.0),
+                                       ('joint2', 'upper_link', 'wrist_3_link', 1.0)]:
+            joint = FakeJoint(name, parent=parent, child=child)
+            joint.origin[0, 3] = x
+            joints.append(joint)
+
+        mock_robot = FakeRobot(joints=joints, links=links)
+
+        fk_cache = app.FKCache(mock_robot, links[-1])
+        assert fk_cache.available
+
+        pose = fk_cache.end_effector_pose({'joint1': math.pi / 2, 'joint2': 0.0})
+        assert np.allclose(pose[:3, 3], [0.0, 1.0, 0.0])
+
+        # Moving only the last joint reuses the cached prefix
+        pose = fk_cache.end_effector_pose({'joint1': math.pi / 2, 'joint2': math.pi / 2})
+        assert np.allclose(pose[:3, 3], [0.0, 1.0, 0.0])
+        assert np.allclose(pose[:3, :3], [[-1.0, 0.0, 0.0], [0.0, -1.0, 0.0], [0.0, 0.0, 1.0]])
+
+    def test_chain_prefix_poses_prismatic_and_fixed(self):
+        """Test the jitted chain kernel on fixed and prismatic joints."""
+        from fk_jit import pack_chain, chain_prefix_poses
+        origin = np.eye(4)
+        origin[2, 3] = 0.5
+        chain = [('mount', 'fixed', origin, np.array([0.0, 0.0, 1.0])),
+                 ('slider', 'prismatic', np.eye(4), np.array([1.0, 0.0, 0.0]))]
+        origins, axes, joint_types = pack_chain(chain)
+        prefix = np.empty((2, 4, 4))
+
+        pose = chain_prefix_poses(np.array([0.0, 0.25]), origins, axes, joint_types, prefix, 0)
+        assert np.allclose(pose[:3, 3], [0.25, 0.0, 0.5])
+        assert np.allclose(prefix[0][:3, 3], [0.0, 0.0, 0.5])
+
+    def test_select_end_effector_pose(self):
+        """Test selecting the end effector pose from forward kinematics results."""
+        ee_link = FakeLink("wrist_3_link")
+        other_link = FakeLink("base_link")
+        ee_pose = np.eye(4)
+        other_pose = np.zeros((4, 4))
+        
+        with patch.object(app, 'EE_LINK', ee_link):
+            assert app.select_end_effector_pose({ee_link: ee_pose, other_link: other_pose}) is ee_pose
+            
+            # Falls back to the last link when the end effector is missing
+            assert app.select_end_effector_pose({other_link: other_pose}) is other_pose
+            assert app.select_end_effector_pose({}) is None
+
+    def test_pose_to_pos_euler(self):
+        """Test extracting position and ZYX Euler angles from a pose matrix."""
+        pose = np.eye(4)
+        pose[:3, :3] = [[0.0, -1.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, 1.0]]
+        pose[:3, 3] = [0.1, 0.2, 0.3]
+
+        position, orientation = app._pose_to_pos_euler(pose)
+
+        assert position == [0.1, 0.2, 0.3]
+        assert np.allclose(orientation, [0.0, 0.0, math.pi / 2])
 
     def test_calculate_end_effector_pose_exception(self):
         """Test end effector pose calculation when exception occurs."""
         joint_angles = {'test_joint': 0.1}
         
-        with patch.object(app, 'robot_arm') as mock_robot_arm:
-            mock_robot_arm.link_fk.side_effect = Exception("Test error")
-            
+        fake_robot = FakeRobot(link_fk_error=Exception("Test error"))
+        
+        with patch.object(app, 'robot_arm', fake_robot):
             result = app.calculate_end_effector_pose(joint_angles)
             
             # Should return default values
@@ -234,8 +364,8 @@ class TestUtilityFunctions:
 
     def test_set_joint_angles(self):
         """Test setting joint angles."""
-        # Initialize current_joint_angles
-        app.current_joint_angles = {}
+        # Initialize the joint state
+        app.joint_state = app.JointState(['joint1', 'joint2', 'joint3'])
         
         test_angles = {
             'joint1': 0.5,
@@ -245,36 +375,33 @@ class TestUtilityFunctions:
         
         app.set_joint_angles(test_angles)
         
-        # Check that current_joint_angles was updated
+        # Check that the joint state was updated
         for joint_name, angle in test_angles.items():
-            assert app.current_joint_angles[joint_name] == angle
+            assert app.joint_state.get(joint_name) == angle
+        assert app.joint_state.as_dict() == test_angles
+
+    def test_joint_state(self):
+        """Test the array-backed joint state."""
+        joint_state = app.JointState(['joint1', 'joint2'])
+        assert joint_state.as_dict() == {'joint1': 0.0, 'joint2': 0.0}
+        
+        joint_state.set({'joint2': 0.7, 'unknown_joint': 1.0})
+        assert joint_state.angles.tolist() == [0.0, 0.7]
+        assert joint_state.get('unknown_joint', None) is None
+        assert joint_state.version == 1
+        
+        # Setting the same angle again does not count as a change
+        joint_state.set({'joint2': 0.7})
+        assert joint_state.version == 1
+        
+        joint_state.set_index(0, 0.3)
+        assert joint_state.get('joint1') == 0.3
+        assert joint_state.version == 2
 
 
 class TestFlaskEndpoints:
     """Test Flask endpoints using the test client."""
 
-    @pytest.fixture
-    def client(self):
-        """Create a test client for the Flask app."""
-        # Mock the robot arm initialization
-        with patch('app.URDF.load'), \
-             patch('app.robot_arm') as mock_robot_arm, \
-             patch('app.run_websocket_server'):
-            
-            # Setup mock robot arm
-            mock_joint = Mock()
-            mock_joint.name = "test_joint"
-            mock_joint.joint_type = "revolute"
-            mock_robot_arm.joints = [mock_joint]
-            
-            # Initialize current_joint_angles
-            app.current_joint_angles = {"test_joint": 0.0}
-            
-            # Configure app for testing
-            app.app.config['TESTING'] = True
-            with app.app.test_client() as client:
-                yield client
-
     def test_index_route(self, client):
         """Test the index route."""
         with patch('app.send_from_directory') as mock_send:
@@ -282,10 +409,39 @@ class TestFlaskEndpoints:
             response = client.get('/')
             assert response.status_code == 200
 
+    def test_jsonify_uses_orjson_provider(self, client):
+        """Test jsonify serializes numpy values through the orjson provider."""
+        with app.app.app_context():
+            response = app.jsonify({'position': np.array([1.0, 2.0, 3.0]), 'step': np.int64(2)})
+        assert response.content_type == 'application/json'
+        assert json.loads(response.data) == {'position': [1.0, 2.0, 3.0], 'step': 2}
+
+    def test_jsonify_falls_back_to_flask_default(self, client):
+        """Test types orjson does not handle are encoded like Flask's default provider."""
+        from decimal import Decimal
+        from markupsafe import Markup
+        with app.app.app_context():
+            response = app.jsonify({'amount': Decimal('1.5'), 'label': Markup('<b>ok</b>')})
+            assert app.app.json.dumps(Decimal('2')) == '"2"'
+        assert json.loads(response.data) == {'amount': '1.5', 'label': '<b>ok</b>'}
+
+    def test_jsonify_honours_sort_keys_and_compact(self, client):
+        """Test the provider keeps DefaultJSONProvider's sort_keys and compact settings."""
+        provider = app.app.json
+        with app.app.app_context():
+            assert app.jsonify({'b': 1, 'a': 2}).data == b'{"a":2,"b":1}'
+            assert app.jsonify(2, 3).data == b'[2,3]'
+            with patch.object(provider, 'sort_keys', False), \
+                 patch.object(provider, 'compact', False):
+                response = app.jsonify({'b': 1, 'a': 2})
+            assert provider.dumps({'b': 1, 'a': 2}, sort_keys=False) == '{"b":1,"a":2}'
+        assert response.data == b'{\n  "b": 1,\n  "a": 2\n}'
+
     def test_health_check(self, client):
         """Test the health check endpoint."""
         response = client.get('/health')
         assert response.status_code == 200
+        assert response.content_type == 'application/json'
         
         data = json.loads(response.data)
         assert data['status'] == 'healthy'
@@ -302,12 +458,42 @@ class TestFlaskEndpoints:
             
             response = client.get('/robot_state')
             assert response.status_code == 200
+            assert response.content_type == 'application/json'
             
             data = json.loads(response.data)
             assert 'joint_angles' in data
             assert 'end_effector' in data
             assert 'timestamp' in data
 
+    def test_get_robot_state_etag(self, client):
+        """Test robot state is not resent while the joint angles are unchanged."""
+        with patch('app.calculate_end_effector_pose') as mock_calc:
+            mock_calc.return_value = {
+                'position': [1.0, 2.0, 3.0],
+                'orientation': [0.1, 0.2, 0.3]
+            }
+            
+            response = client.get('/robot_state')
+            etag = response.headers['ETag']
+            
+            response = client.get('/robot_state', headers={'If-None-Match': etag})
+            assert response.status_code == 304
+            
+            app.set_joint_angles({'shoulder_pan_joint': 0.5})
+            response = client.get('/robot_state', headers={'If-None-Match': etag})
+            assert response.status_code == 200
+            
+            # A rebuilt state (or a restarted process) never matches an old ETag
+            etag = response.headers['ETag']
+            app.joint_state = app.JointState(app.joint_state.names)
+            app.set_joint_angles({'shoulder_pan_joint': 0.5})
+            response = client.get('/robot_state', headers={'If-None-Match': etag})
+            assert response.status_code == 200
+            
+            with patch.object(app, 'BOOT_ID', 'other-boot'):
+                response = client.get('/robot_state', headers={'If-None-Match': response.headers['ETag']})
+                assert response.status_code == 200
+
     def test_set_joints_endpoint_valid(self, client):
         """Test setting joints with valid data."""
         valid_data = {
@@ -330,6 +516,29 @@ class TestFlaskEndpoints:
             assert 'end_effector' in data
             assert 'timestamp' in data
 
+    def test_set_joints_before_robot_loaded(self, client):
+        """Test the first /set_joints loads the robot instead of dropping the angles."""
+        names = ['shoulder_pan_joint', 'shoulder_lift_joint', 'elbow_joint',
+                 'wrist_1_joint', 'wrist_2_joint', 'wrist_3_joint']
+        fake_robot = FakeRobot(joints=[FakeJoint(name) for name in names])
+
+        with patch.object(app, 'robot_arm', None), \
+             patch.object(app, 'ACTUATED_JOINT_NAMES', ()), \
+             patch.object(app, 'EE_LINK', None), \
+             patch.object(app, 'joint_state', app.JointState(())), \
+             patch.object(app, 'fk_cache', app.fk_cache), \
+             patch('app.URDF') as mock_urdf, \
+             patch('app.calculate_end_effector_pose') as mock_calc:
+            mock_urdf.load.return_value = fake_robot
+            mock_calc.return_value = {'position': [0, 0, 0], 'orientation': [0, 0, 0]}
+
+            response = client.post('/set_joints',
+                                   data=json.dumps({'joints': [0.1, 0.2, 0.3, 0.4, 0.5, 0.6]}),
+                                   content_type='application/json')
+            assert response.status_code == 200
+            mock_urdf.load.assert_called_once()
+            assert json.loads(response.data)['joint_angles'] == dict(zip(names, [0.1, 0.2, 0.3, 0.4, 0.5, 0.6]))
+
     def test_set_joints_endpoint_invalid_data(self, client):
         """Test setting joints with invalid data."""
         # Test missing joints key
@@ -344,12 +553,24 @@ class TestFlaskEndpoints:
                              data=json.dumps(invalid_data),
                              content_type='application/json')
         assert response.status_code == 400
+        
+        # Test a body that is not valid JSON
+        response = client.post('/set_joints',
+                             data='{"joints": [0.1,',
+                             content_type='application/json')
+        assert response.status_code == 400
+        
+        # Test a JSON body sent without a JSON content type
+        response = client.post('/set_joints',
+                             data=json.dumps({'joints': [0.1, 0.2, 0.3, 0.4, 0.5, 0.6]}),
+                             content_type='text/plain')
+        assert response.status_code == 400
 
     def test_move_robot_default(self, client):
         """Test move robot with default movement type."""
         with patch('app.generate_movement_sequence') as mock_gen, \
              patch('app.execute_movement_sequence') as mock_exec, \
-             patch('threading.Thread') as mock_thread:
+             patch('app.submit_motion') as mock_submit:
             
             mock_gen.return_value = [{'test_joint': 0.1}]
             
@@ -358,6 +579,7 @@ class TestFlaskEndpoints:
             
             data = json.loads(response.data)
             assert 'sinusoidal' in data['message']
+            mock_submit.assert_called_once()
 
     def test_move_robot_trapezoidal(self, client):
         """Test move robot with trapezoidal movement type."""
@@ -365,7 +587,7 @@ class TestFlaskEndpoints:
         
         with patch('app.generate_trapezoidal_movement_sequence') as mock_gen, \
              patch('app.execute_movement_sequence') as mock_exec, \
-             patch('threading.Thread') as mock_thread:
+             patch('app.submit_motion') as mock_submit:
             
             mock_gen.return_value = [{'test_joint': 0.1}]
             
@@ -376,6 +598,7 @@ class TestFlaskEndpoints:
             
             data = json.loads(response.data)
             assert 'trapezoidal' in data['message']
+            mock_submit.assert_called_once()
 
     def test_move_joint_smooth_valid(self, client):
         """Test smooth joint movement with valid data."""
@@ -386,20 +609,16 @@ class TestFlaskEndpoints:
             'accel_time': 0.5
         }
         
-        # Initialize current_joint_angles for the test
-        app.current_joint_angles = {
-            'shoulder_pan_joint': 0.0,
-            'shoulder_lift_joint': 0.0,
-            'elbow_joint': 0.0,
-            'wrist_1_joint': 0.0,
-            'wrist_2_joint': 0.0,
-            'wrist_3_joint': 0.0
-        }
+        # Initialize the joint state for the test
+        app.joint_state = app.JointState([
+            'shoulder_pan_joint', 'shoulder_lift_joint', 'elbow_joint',
+            'wrist_1_joint', 'wrist_2_joint', 'wrist_3_joint'
+        ])
         
         with patch('app.trapezoidal_profile') as mock_profile, \
              patch('app.calculate_end_effector_pose') as mock_calc, \
              patch('app.send_to_websocket') as mock_send, \
-             patch('threading.Thread') as mock_thread:
+             patch('app.submit_motion') as mock_submit:
             
             mock_profile.return_value = lambda t: 0.5  # Simple constant function
             mock_calc.return_value = {'position': [0, 0, 0], 'orientation': [0, 0, 0]}
@@ -413,6 +632,70 @@ class TestFlaskEndpoints:
             assert 'Smooth movement started' in data['message']
             assert data['movement_time'] == 2.0
             assert data['joint_name'] == 'shoulder_pan_joint'
+            mock_submit.assert_called_once()
+
+    def test_move_joint_smooth_sends_deltas(self, client):
+        """Test the movement task sends a full frame first, then only changed joints."""
+        with patch('app.trapezoidal_profile', return_value=lambda t: t), \
+             patch('app.calculate_end_effector_pose',
+                   return_value={'position': [0, 0, 0], 'orientation': [0, 0, 0]}), \
+             patch('app.submit_motion') as mock_submit:
+            response = client.post('/move_joint_smooth',
+                                 data=json.dumps({'joint_index': 0, 'target_angle': 0.2,
+                                                  'movement_time': 0.2}),
+                                 content_type='application/json')
+            assert response.status_code == 200
+            task = mock_submit.call_args[0][0]
+            
+            # Another client connects before the third tick, replacing the first one
+            # before the fifth, which leaves the client count unchanged
+            with patch('app.get_connections_opened', side_effect=[1, 1, 2, 2, 3]), \
+                 patch('app.has_connected_clients', return_value=True), \
+                 patch('app.send_to_websocket') as mock_send, \
+                 patch('time.sleep'):
+                task(threading.Event(), 1)
+        
+        frames = [json.loads(c[0][0]) for c in mock_send.call_args_list]
+        *moves, final = frames
+        all_joints = set(app.joint_state.names)
+        
+        assert [frame['delta'] for frame in moves] == [False, True, False, True, False]
+        for frame in moves:
+            expected = all_joints if not frame['delta'] else {'shoulder_pan_joint'}
+            assert set(frame['joint_angles']) == expected
+            assert frame['motion_id'] == 1
+        
+        assert final['movement_complete'] is True
+        assert set(final['joint_angles']) == all_joints
+        assert final['joint_angles']['shoulder_pan_joint'] == pytest.approx(0.2)
+
+    def test_move_joint_smooth_full_frames_are_reliable(self, client):
+        """Test full frames after a connection change and the final frame are queued as reliable."""
+        with patch('app.trapezoidal_profile', return_value=lambda t: t), \
+             patch('app.calculate_end_effector_pose',
+                   return_value={'position': [0, 0, 0], 'orientation': [0, 0, 0]}), \
+             patch('app.submit_motion') as mock_submit:
+            response = client.post('/move_joint_smooth',
+                                 data=json.dumps({'joint_index': 0, 'target_angle': 0.2,
+                                                  'movement_time': 0.2}),
+                                 content_type='application/json')
+            assert response.status_code == 200
+            task = mock_submit.call_args[0][0]
+            
+            with patch('app.get_connections_opened', side_effect=[1, 1, 2, 2, 2]), \
+                 patch('app.has_connected_clients', return_value=True), \
+                 patch('app.send_to_websocket') as mock_send, \
+                 patch('time.sleep'):
+                task(threading.Event(), 1)
+        
+        frames = [(json.loads(c[0][0]), c[1]) for c in mock_send.call_args_list]
+        *moves, (final, final_kwargs) = frames
+        assert [frame['delta'] for frame, _ in moves] == [False, True, False, True, True]
+        assert [kwargs == {'reliable': True} for _, kwargs in moves] == \
+            [True, False, True, False, False]
+        
+        assert final['movement_complete'] is True
+        assert final_kwargs == {'reliable': True}
 
     def test_move_joint_smooth_invalid_data(self, client):
         """Test smooth joint movement with invalid data."""
@@ -437,6 +720,61 @@ class TestFlaskEndpoints:
             assert response.status_code == 200
 
 
+class TestMotionWorker:
+    """Test the single-worker motion executor."""
+
+    def test_submit_motion_cancels_previous(self):
+        """Test submitting a movement signals the previous one to stop."""
+        started = threading.Event()
+        events = []
+        
+        motion_ids = []
+        
+        def long_task(cancel_event, motion_id):
+            events.append(cancel_event)
+            motion_ids.append(motion_id)
+            started.set()
+            cancel_event.wait(5.0)
+        
+        def short_task(cancel_event, motion_id):
+            events.append(cancel_event)
+            motion_ids.append(motion_id)
+        
+        first = app.submit_motion(long_task)
+        assert started.wait(5.0)
+        second = app.submit_motion(short_task)
+        
+        first.result(timeout=5.0)
+        second.result(timeout=5.0)
+        
+        assert events[0].is_set()
+        assert not events[1].is_set()
+        
+        # Each movement gets a newer id than the one it replaced
+        assert motion_ids[1] > motion_ids[0]
+        assert app.current_motion_id == motion_ids[1]
+
+    def test_shutdown_motion_worker_cancels_running_movement(self):
+        """Test shutdown stops the running movement and the worker thread."""
+        started = threading.Event()
+        executor = app.ThreadPoolExecutor(max_workers=1)
+        
+        def long_task(cancel_event, motion_id):
+            started.set()
+            cancel_event.wait(5.0)
+            return cancel_event.is_set()
+        
+        with patch.object(app, 'MOTION_EXEC', executor), \
+             patch.object(app, 'current_motion_future', None):
+            future = app.submit_motion(long_task)
+            assert started.wait(5.0)
+            
+            assert app.shutdown_motion_worker(timeout=1.0) is True
+            assert future.result(timeout=0) is True
+            with pytest.raises(RuntimeError):
+                executor.submit(long_task, threading.Event(), 0)
+
+
 class TestExecuteMovementSequence:
     """Test the execute_movement_sequence function."""
 
@@ -448,35 +786,108 @@ class TestExecuteMovementSequence:
             {'joint1': 0.3, 'joint2': 0.4}
         ]
         
-        with patch.object(app, 'robot_arm') as mock_robot_arm, \
+        mock_link = FakeLink("wrist_3_link")
+        
+        # Mock forward kinematics result
+        mock_pose = np.array([
+            [1.0, 0.0, 0.0, 1.0],
+            [0.0, 1.0, 0.0, 2.0],
+            [0.0, 0.0, 1.0, 3.0],
+            [0.0, 0.0, 0.0, 1.0]
+        ])
+        fake_robot = FakeRobot(link_fk_batch_return={
+            mock_link: np.stack([mock_pose] * len(test_sequence))
+        })
+        
+        with patch.object(app, 'robot_arm', fake_robot), \
+             patch.object(app, 'EE_LINK', mock_link), \
+             patch('app.get_connections_opened', return_value=1), \
+             patch('app.has_connected_clients', return_value=True), \
              patch('app.set_joint_angles') as mock_set_joints, \
              patch('app.send_to_websocket') as mock_send, \
              patch('time.sleep') as mock_sleep:
             
-            # Mock forward kinematics result
-            mock_pose = np.array([
-                [1.0, 0.0, 0.0, 1.0],
-                [0.0, 1.0, 0.0, 2.0],
-                [0.0, 0.0, 1.0, 3.0],
-                [0.0, 0.0, 0.0, 1.0]
-            ])
-            
-            mock_link = Mock()
-            mock_link.name = "wrist_3_link"
-            
-            mock_robot_arm.link_fk.return_value = {mock_link: mock_pose}
-            
             app.execute_movement_sequence(test_sequence)
             
+            # Forward kinematics should be computed once for the whole sequence
+            assert fake_robot.link_fk_batch_calls == [test_sequence]
+            assert fake_robot.link_fk_calls == 0
+            
             # Verify that set_joint_angles was called for each step
             assert mock_set_joints.call_count == len(test_sequence)
             
-            # Verify that websocket data was sent for each step
-            assert mock_send.call_count == len(test_sequence)
+            # The whole trajectory goes out as a single frame that must not be dropped
+            mock_send.assert_called_once()
+            assert mock_send.call_args[1] == {'reliable': True}
+            payload = json.loads(mock_send.call_args[0][0])
+            assert payload['type'] == 'trajectory'
+            assert payload['start_step'] == 0
+            assert payload['joint_names'] == ['joint1', 'joint2']
+            assert np.allclose(payload['joint_angles'], [[0.1, 0.2], [0.3, 0.4]])
+            assert payload['end_effector']['position'] == [[1.0, 2.0, 3.0]] * len(test_sequence)
             
             # Verify sleep was called for each step
             assert mock_sleep.call_count == len(test_sequence)
 
+    def test_execute_movement_sequence_resends_to_late_client(self):
+        """Test a client connecting mid-move gets the trajectory from the current step."""
+        test_sequence = [{'joint1': 0.1 * (i + 1)} for i in range(5)]
+        
+        # Nobody listens at first; then a client connects, a second one connects, and
+        # the first reloads, which leaves the client count unchanged. The client check
+        # only runs when a new connection shows up.
+        fake_robot = FakeRobot()
+        
+        with patch.object(app, 'robot_arm', fake_robot), \
+             patch('app.get_connections_opened', side_effect=[0, 1, 1, 2, 3]), \
+             patch('app.has_connected_clients', side_effect=[False, True, True, True]), \
+             patch('app.set_joint_angles') as mock_set_joints, \
+             patch('app.send_to_websocket') as mock_send, \
+             patch('time.sleep'):
+            app.execute_movement_sequence(test_sequence, motion_id=7)
+            
+            # FK is computed once and the frame is re-sent for every new connection
+            assert fake_robot.link_fk_batch_calls == [test_sequence]
+            assert mock_set_joints.call_count == len(test_sequence)
+            payloads = [json.loads(c[0][0]) for c in mock_send.call_args_list]
+            assert [p['start_step'] for p in payloads] == [1, 3, 4]
+            assert all(p['motion_id'] == 7 and len(p['joint_angles']) == 5 for p in payloads)
+            assert all(c[1] == {'reliable': True} for c in mock_send.call_args_list)
+
+    def test_execute_movement_sequence_no_clients(self):
+        """Test the joint state still advances without computing FK when nobody listens."""
+        test_sequence = [{'joint1': 0.1}, {'joint1': 0.2}]
+        fake_robot = FakeRobot()
+        
+        with patch.object(app, 'robot_arm', fake_robot), \
+             patch('app.get_connections_opened', return_value=0), \
+             patch('app.has_connected_clients', return_value=False), \
+             patch('app.set_joint_angles') as mock_set_joints, \
+             patch('app.send_to_websocket') as mock_send, \
+             patch('time.sleep') as mock_sleep:
+            
+            app.execute_movement_sequence(test_sequence)
+            
+            assert fake_robot.link_fk_batch_calls == []
+            mock_send.assert_not_called()
+            assert mock_set_joints.call_count == len(test_sequence)
+            assert mock_sleep.call_count == len(test_sequence)
+
+    def test_execute_movement_sequence_cancelled(self):
+        """Test a cancelled movement sequence stops sending frames."""
+        cancel_event = threading.Event()
+        cancel_event.set()
+        fake_robot = FakeRobot()
+        
+        with patch.object(app, 'robot_arm', fake_robot), \
+             patch('app.set_joint_angles') as mock_set_joints, \
+             patch('app.send_to_websocket') as mock_send:
+            app.execute_movement_sequence([{'joint1': 0.1}], cancel_event)
+            
+            assert fake_robot.link_fk_batch_calls == []
+            mock_set_joints.assert_not_called()
+            mock_send.assert_not_called()
+
 
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
\ No newline at end of file
@@ -0,0 +1,162 @@
+"""
+Test cases for the URDF cache and joint handling in robot_controller.py
+"""
+
+import pytest
+import os
+from unittest.mock import patch
+import numpy as np
+
+# Import the robot controller module
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import robot_controller
+
+from tests.fakes import FakeLink, FakeRobot
+
+
+@pytest.fixture
+def urdf_file(tmp_path):
+    """
+    Provide a URDF file on disk with a fixed modification time.
+    """
+    path = tmp_path / "robot.urdf"
+    path.write_text("<robot name='test'/>")
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    return str(path)
+
+
+@pytest.fixture
+def cache_home(tmp_path, monkeypatch):
+    """
+    Point the URDF cache at a private directory under tmp_path.
+    """
+    base = tmp_path / "cache"
+    monkeypatch.setenv('XDG_CACHE_HOME', str(base))
+    return base / 'robot_controller'
+
+
+@pytest.fixture
+def mock_urdf():
+    """
+    Mock URDF.load so each parse returns a new picklable model.
+    """
+    with patch('urdfpy.URDF') as mock_urdf_class:
+        mock_urdf_class.load.side_effect = lambda path: {'path': path}
+        yield mock_urdf_class
+
+
+def cache_files(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir) if name.endswith('.pkl'))
+
+
+class TestURDFCache:
+    """Test the pickled URDF cache used by get_robot_arm."""
+
+    def test_cache_hit(self, urdf_file, cache_home, mock_urdf):
+        """Test the second load of an unchanged URDF is read from the cache."""
+        first = robot_controller._load_urdf_cached(urdf_file)
+        second = robot_controller._load_urdf_cached(urdf_file)
+
+        assert first == second == {'path': urdf_file}
+        mock_urdf.load.assert_called_once_with(urdf_file)
+        assert len(cache_files(cache_home)) == 1
+
+    def test_mtime_change_invalidates_cache(self, urdf_file, cache_home, mock_urdf):
+        """Test touching the URDF parses it again and removes the stale entry."""
+        robot_controller._load_urdf_cached(urdf_file)
+        old_files = cache_files(cache_home)
+
+        os.utime(urdf_file, ns=(2_000_000_000, 2_000_000_000))
+        robot_controller._load_urdf_cached(urdf_file)
+
+        assert mock_urdf.load.call_count == 2
+        new_files = cache_files(cache_home)
+        assert len(new_files) == 1
+        assert new_files != old_files
+
+    def test_size_change_invalidates_cache(self, urdf_file, cache_home, mock_urdf):
+        """Test a URDF with a different size but the same mtime is parsed again."""
+        robot_controller._load_urdf_cached(urdf_file)
+
+        with open(urdf_file, 'a') as f:
+            f.write("\n<!-- edited -->")
+        os.utime(urdf_file, ns=(1_000_000_000, 1_000_000_000))
+        robot_controller._load_urdf_cached(urdf_file)
+
+        assert mock_urdf.load.call_count == 2
+        assert len(cache_files(cache_home)) == 1
+
+    def test_shared_cache_dir_is_refused(self, urdf_file, cache_home, mock_urdf):
+        """Test a cache directory writable by others is not used."""
+        cache_home.mkdir(parents=True)
+        os.chmod(cache_home, 0o777)
+
+        assert robot_controller._urdf_cache_dir() is None
+
+        robot_controller._load_urdf_cached(urdf_file)
+        robot_controller._load_urdf_cached(urdf_file)
+
+        assert mock_urdf.load.call_count == 2
+        assert cache_files(cache_home) == []
+
+    @pytest.mark.skipif(not hasattr(os, 'getuid'), reason="file ownership needs os.getuid")
+    def test_cache_dir_owned_by_someone_else_is_refused(self, cache_home):
+        """Test a cache directory owned by another user is not used."""
+        cache_home.mkdir(parents=True, mode=0o700)
+
+        with patch('os.getuid', return_value=os.getuid() + 1):
+            assert robot_controller._urdf_cache_dir() is None
+
+    def test_shared_cache_file_is_not_unpickled(self, urdf_file, cache_home, mock_urdf):
+        """Test a cache entry writable by others is parsed again instead of unpickled."""
+        robot_controller._load_urdf_cached(urdf_file)
+        cache_path = os.path.join(cache_home, cache_files(cache_home)[0])
+        os.chmod(cache_path, 0o666)
+
+        assert robot_controller._is_private_file(cache_path) is False
+
+        with patch('pickle.load') as mock_pickle_load:
+            robot_controller._load_urdf_cached(urdf_file)
+
+        mock_pickle_load.assert_not_called()
+        assert mock_urdf.load.call_count == 2
+
+    @pytest.mark.skipif(not hasattr(os, 'getuid'), reason="file ownership needs os.getuid")
+    def test_cache_file_owned_by_someone_else_is_refused(self, urdf_file, cache_home, mock_urdf):
+        """Test a cache entry owned by another user is not trusted."""
+        robot_controller._load_urdf_cached(urdf_file)
+        cache_path = os.path.join(cache_home, cache_files(cache_home)[0])
+
+        with patch('os.getuid', return_value=os.getuid() + 1):
+            assert robot_controller._is_private_file(cache_path) is False
+
+
+class TestJointAngles:
+    """Test the joint angle state kept by robot_controller."""
+
+    def test_set_joint_angles_keeps_unknown_joints(self):
+        """Test every given joint is stored, including names the URDF does not define."""
+        with patch.object(robot_controller, 'current_joint_angles', {'elbow_joint': 0.0}):
+            robot_controller.set_joint_angles({'elbow_joint': 0.5, 'gripper_joint': 0.1})
+
+            assert robot_controller.current_joint_angles == {'elbow_joint': 0.5, 'gripper_joint': 0.1}
+
+
+    def test_calculate_and_display_fk_keeps_float64_positions(self):
+        """Test link positions are returned at the precision forward kinematics produced."""
+        links = [FakeLink("base_link"), FakeLink("tool0")]
+        pose = np.eye(4)
+        pose[:3, 3] = [0.1234567891, -0.5, 1.0 / 3.0]
+        fake_robot = FakeRobot(links=links, link_fk_return={links[0]: np.eye(4), links[1]: pose})
+
+        with patch.object(robot_controller, 'get_robot_arm', return_value=fake_robot), \
+             patch.object(robot_controller, '_get_render_scene', side_effect=RuntimeError("no display")):
+            positions = robot_controller.calculate_and_display_fk({})
+
+        assert positions.dtype == np.float64
+        assert positions.tolist() == [[0.0, 0.0, 0.0], pose[:3, 3].tolist()]
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
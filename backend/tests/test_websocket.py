@@ -4,6 +4,7 @@ Test cases for WebSocket functionality in app_websocket.py
 
 import pytest
 import asyncio
+import collections
 import json
 from unittest.mock import Mock, patch, AsyncMock
 import websockets
@@ -25,31 +26,67 @@ class TestWebSocketFunctions:
     """Test WebSocket related functions."""
 
     @pytest.mark.skipif(app_websocket is None, reason="app_websocket module not available")
-    async def test_send_to_all_with_clients(self):
+    def test_send_to_all_with_clients(self):
         """Test sending data to all connected clients."""
         # Mock connected clients
-        mock_client1 = AsyncMock()
-        mock_client2 = AsyncMock()
+        mock_client1 = Mock()
+        mock_client2 = Mock()
+        for client in (mock_client1, mock_client2):
+            client.transport.get_write_buffer_size.return_value = 0
         
         app_websocket.connected_clients = {mock_client1, mock_client2}
         
         test_data = "test message"
         
-        await app_websocket.send_to_all(test_data)
+        with patch.object(app_websocket, 'broadcast') as mock_broadcast:
+            app_websocket.send_to_all(test_data)
         
-        # Verify both clients received the message
-        mock_client1.send.assert_called_once_with(test_data)
-        mock_client2.send.assert_called_once_with(test_data)
+        # Verify the message was broadcast to both clients
+        clients, message = mock_broadcast.call_args[0]
+        assert set(clients) == {mock_client1, mock_client2}
+        assert message == test_data
 
     @pytest.mark.skipif(app_websocket is None, reason="app_websocket module not available")
-    async def test_send_to_all_no_clients(self):
+    def test_send_to_all_skips_lagging_clients(self):
+        """Test a client with a full write buffer is skipped without affecting the others."""
+        lagging_client = Mock()
+        lagging_client.transport.get_write_buffer_size.return_value = app_websocket.SEND_BUFFER_LIMIT + 1
+        healthy_client = Mock()
+        healthy_client.transport.get_write_buffer_size.return_value = 0
+        
+        app_websocket.connected_clients = {lagging_client, healthy_client}
+        
+        with patch.object(app_websocket, 'broadcast') as mock_broadcast:
+            app_websocket.send_to_all("test message")
+        
+        clients, _ = mock_broadcast.call_args[0]
+        assert list(clients) == [healthy_client]
+        assert app_websocket.connected_clients == {lagging_client, healthy_client}
+
+    @pytest.mark.skipif(app_websocket is None, reason="app_websocket module not available")
+    async def test_handle_message_echo(self):
+        """Test a valid message is acknowledged with its data echoed back."""
+        mock_client = AsyncMock()
+        
+        await app_websocket.handle_message(mock_client, '{"command": "ping"}')
+        
+        response = json.loads(mock_client.send.call_args[0][0])
+        assert response == {"status": "received", "data": {"command": "ping"}}
+        
+        # Invalid JSON is not acknowledged
+        mock_client.send.reset_mock()
+        await app_websocket.handle_message(mock_client, 'not json')
+        mock_client.send.assert_not_called()
+
+    @pytest.mark.skipif(app_websocket is None, reason="app_websocket module not available")
+    def test_send_to_all_no_clients(self):
         """Test sending data when no clients are connected."""
         app_websocket.connected_clients = set()
         
         test_data = "test message"
         
         # Should not raise an error
-        await app_websocket.send_to_all(test_data)
+        app_websocket.send_to_all(test_data)
 
     @pytest.mark.skipif(app_websocket is None, reason="app_websocket module not available")
     def test_has_connected_clients_true(self):
@@ -59,6 +96,147 @@ class TestWebSocketFunctions:
         
         assert app_websocket.has_connected_clients() is True
 
+    @pytest.mark.skipif(app_websocket is None, reason="app_websocket module not available")
+    async def test_register_counts_connections(self):
+        """Test every connection bumps the counter, which stays put after disconnects."""
+        class ClosedClient:
+            def __aiter__(self):
+                return self
+            
+            async def __anext__(self):
+                raise StopAsyncIteration
+        
+        with patch.object(app_websocket, 'connected_clients', set()), \
+             patch.object(app_websocket, 'connections_opened', 0):
+            await app_websocket.register(ClosedClient())
+            await app_websocket.register(ClosedClient())
+            
+            assert app_websocket.get_connections_opened() == 2
+            assert not app_websocket.has_connected_clients()
+
+    @pytest.mark.skipif(app_websocket is None, reason="app_websocket module not available")
+    def test_queue_message(self):
+        """Test queue_message wakes the server loop once per batch of frames."""
+        mock_loop = Mock()
+        mock_loop.is_running.return_value = True
+        queue = collections.deque()
+        
+        with patch.object(app_websocket, 'WS_LOOP', mock_loop), \
+             patch.object(app_websocket, 'SEND_QUEUE', queue), \
+             patch.object(app_websocket, 'flush_pending', False):
+            assert app_websocket.queue_message(b"first") is True
+            assert app_websocket.queue_message(b"second") is True
+            
+            assert list(queue) == [(b"first", False), (b"second", False)]
+            mock_loop.call_soon_threadsafe.assert_called_once_with(app_websocket.flush_send_queue)
+
+    @pytest.mark.skipif(app_websocket is None, reason="app_websocket module not available")
+    def test_stop_server(self):
+        """Test stop_server sets the stop event on the server loop."""
+        mock_loop = Mock()
+        mock_loop.is_running.return_value = True
+        stop_event = Mock()
+        
+        with patch.object(app_websocket, 'WS_LOOP', mock_loop), \
+             patch.object(app_websocket, 'STOP_EVENT', stop_event):
+            assert app_websocket.stop_server() is True
+            mock_loop.call_soon_threadsafe.assert_called_once_with(stop_event.set)
+        
+        with patch.object(app_websocket, 'WS_LOOP', None):
+            assert app_websocket.stop_server() is False
+
+    @pytest.mark.skipif(app_websocket is None, reason="app_websocket module not available")
+    async def test_close_all_clients(self):
+        """Test shutdown closes every client, even when one of them fails to close."""
+        healthy_client = AsyncMock()
+        broken_client = AsyncMock()
+        broken_client.close.side_effect = ConnectionError("gone")
+        
+        with patch.object(app_websocket, 'connected_clients', {healthy_client, broken_client}):
+            await app_websocket.close_all_clients()
+        
+        healthy_client.close.assert_awaited_once_with(1001, "Server shutting down")
+        broken_client.close.assert_awaited_once()
+
+    @pytest.mark.skipif(app_websocket is None, reason="app_websocket module not available")
+    def test_queue_message_server_not_running(self):
+        """Test queue_message when the server loop has not started."""
+        with patch.object(app_websocket, 'WS_LOOP', None):
+            assert app_websocket.queue_message(b"frame") is False
+
+    @pytest.mark.skipif(app_websocket is None, reason="app_websocket module not available")
+    def test_flush_send_queue_drops_oldest(self):
+        """Test a full send queue drops the oldest frame and flushes the rest as one batch."""
+        mock_loop = Mock()
+        mock_loop.is_running.return_value = True
+        queue = collections.deque()
+        
+        with patch.object(app_websocket, 'WS_LOOP', mock_loop), \
+             patch.object(app_websocket, 'SEND_QUEUE', queue), \
+             patch.object(app_websocket, 'SEND_QUEUE_SIZE', 2), \
+             patch.object(app_websocket, 'flush_pending', False), \
+             patch.object(app_websocket, 'send_to_all') as mock_send_all:
+            for message in (b'"first"', b'"second"', b'"third"'):
+                app_websocket.queue_message(message)
+            app_websocket.flush_send_queue()
+            
+            assert app_websocket.flush_pending is False
+        
+        mock_send_all.assert_called_once_with(b'{"batch":["second","third"]}')
+        assert not queue
+
+    @pytest.mark.skipif(app_websocket is None, reason="app_websocket module not available")
+    def test_reliable_message_survives_full_queue(self):
+        """Test a reliable message is kept when the send queue overflows and reaches lagging clients."""
+        mock_loop = Mock()
+        mock_loop.is_running.return_value = True
+        lagging_client = Mock()
+        lagging_client.transport.get_write_buffer_size.return_value = app_websocket.SEND_BUFFER_LIMIT + 1
+        
+        with patch.object(app_websocket, 'WS_LOOP', mock_loop), \
+             patch.object(app_websocket, 'SEND_QUEUE', collections.deque()), \
+             patch.object(app_websocket, 'SEND_QUEUE_SIZE', 2), \
+             patch.object(app_websocket, 'flush_pending', False), \
+             patch.object(app_websocket, 'connected_clients', {lagging_client}), \
+             patch.object(app_websocket, 'broadcast') as mock_broadcast:
+            app_websocket.queue_message(b'"trajectory"', reliable=True)
+            for message in (b'"first"', b'"second"', b'"third"'):
+                app_websocket.queue_message(message)
+            app_websocket.flush_send_queue()
+        
+        # Only the reliable frame gets past the lagging client's buffer limit
+        sent = [(list(c[0][0]), c[0][1]) for c in mock_broadcast.call_args_list]
+        assert sent == [([lagging_client], b'"trajectory"'), ([], b'{"batch":["second","third"]}')]
+
+    @pytest.mark.skipif(app_websocket is None, reason="app_websocket module not available")
+    def test_flush_send_queue_keeps_order(self):
+        """Test frames queued before a reliable frame are sent before it, and later ones after."""
+        mock_loop = Mock()
+        mock_loop.is_running.return_value = True
+        
+        with patch.object(app_websocket, 'WS_LOOP', mock_loop), \
+             patch.object(app_websocket, 'SEND_QUEUE', collections.deque()), \
+             patch.object(app_websocket, 'flush_pending', False), \
+             patch.object(app_websocket, 'send_to_all') as mock_send_all:
+            app_websocket.queue_message(b'"old delta"')
+            app_websocket.queue_message(b'"full"', reliable=True)
+            app_websocket.queue_message(b'"new delta"')
+            app_websocket.flush_send_queue()
+        
+        assert mock_send_all.call_args_list == [
+            ((b'"old delta"',), {}),
+            ((b'"full"',), {'reliable': True}),
+            ((b'"new delta"',), {}),
+        ]
+
+    @pytest.mark.skipif(app_websocket is None, reason="app_websocket module not available")
+    def test_merge_messages(self):
+        """Test queued messages are merged into a single batch document."""
+        assert app_websocket.merge_messages([b'{"a":1}']) == b'{"a":1}'
+        
+        merged = app_websocket.merge_messages([b'{"a":1}', '{"b":2}'])
+        assert json.loads(merged) == {"batch": [{"a": 1}, {"b": 2}]}
+
     @pytest.mark.skipif(app_websocket is None, reason="app_websocket module not available")
     def test_has_connected_clients_false(self):
         """Test has_connected_clients when no clients are connected."""
@@ -96,21 +274,19 @@ class TestWebSocketIntegration:
         
         test_data = {"test": "data"}
         
+        mock_loop = Mock()
+        mock_loop.is_running.return_value = True
+        
         with patch('app.has_connected_clients', return_value=True), \
-             patch('app.send_to_all') as mock_send_all, \
-             patch('asyncio.new_event_loop') as mock_new_loop, \
-             patch('asyncio.set_event_loop') as mock_set_loop:
-            
-            mock_loop = Mock()
-            mock_new_loop.return_value = mock_loop
+             patch.object(app_websocket, 'WS_LOOP', mock_loop), \
+             patch.object(app_websocket, 'SEND_QUEUE', collections.deque()), \
+             patch.object(app_websocket, 'flush_pending', False):
             
             app.send_to_websocket(test_data)
             
-            # Verify the event loop handling
-            mock_new_loop.assert_called_once()
-            mock_set_loop.assert_called_once_with(mock_loop)
-            mock_loop.run_until_complete.assert_called_once()
-            mock_loop.close.assert_called_once()
+            # Verify the send is handed to the server's event loop
+            assert list(app_websocket.SEND_QUEUE) == [(test_data, False)]
+            mock_loop.call_soon_threadsafe.assert_called_once_with(app_websocket.flush_send_queue)
 
 
 if __name__ == '__main__':
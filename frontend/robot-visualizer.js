@@ -12,6 +12,10 @@ class RobotVisualizer {
             end_effector: { position: [0, 0, 0], orientation: [0, 0, 0] },
         };
         this.trajectories = {};
+        this.latestJointAngles = {};  // Joint angles merged from full and delta updates
+        this.latestMotionId = 0;  // Frames from a superseded movement are ignored
+        this.trajectoryPlayback = null;  // Token of the trajectory frame being animated
+        this.textDecoder = new TextDecoder();
         this.isConnected = false;
         this.isMoving = false;  // Track if robot is currently moving
         this.movingJoint = -1;  // Track which joint is currently moving
@@ -398,9 +402,14 @@ class RobotVisualizer {
         
         console.log(`Connecting to WebSocket: ${socketUrl}`);
         this.socket = new WebSocket(socketUrl);
+        // The backend sends JSON as binary frames
+        this.socket.binaryType = 'arraybuffer';
 
         this.socket.onopen = () => {
             console.log("WebSocket connection established.");
+            // A restarted backend numbers its movements from 1 again
+            this.latestMotionId = 0;
+            this.latestJointAngles = {};
             this.isConnected = true;
             this.updateConnectionStatus(true);
             this.showMessage("Connected to robot controller.", "success");
@@ -408,22 +417,13 @@ class RobotVisualizer {
 
         this.socket.onmessage = (event) => {
             try {
-                const data = JSON.parse(event.data);
+                const text = typeof event.data === 'string' ? event.data : this.textDecoder.decode(event.data);
+                const data = JSON.parse(text);
                 // console.log("Received data:", data);
                 
-                // Handle movement completion
-                if (data.movement_complete) {
-                    this.handleMovementComplete(data);
-                    return;
-                }
-                
-                // Handle movement progress updates
-                if (data.movement_progress) {
-                    this.handleMovementProgress(data);
-                }
-                
-                this.updateRobotVisualization(data);
-                this.updateRobotDisplay(data);
+                // Frames queued while the socket was busy arrive merged into one batch
+                const frames = data.batch || [data];
+                frames.forEach((frame) => this.handleFrame(frame));
             } catch (e) {
                 console.error("Failed to parse message:", e);
             }
@@ -444,6 +444,75 @@ class RobotVisualizer {
         };
     }
     
+    handleFrame(data) {
+        // Drop frames still in flight from a movement that has been replaced
+        if (data.motion_id) {
+            if (data.motion_id < this.latestMotionId) return;
+            this.latestMotionId = data.motion_id;
+        }
+        
+        // Automated sequences arrive as one frame and are animated locally
+        if (data.type === 'trajectory') {
+            this.playTrajectoryFrame(data);
+            return;
+        }
+        
+        // Delta updates only carry the joints that changed
+        if (data.joint_angles) {
+            data.joint_angles = Object.assign(this.latestJointAngles, data.joint_angles);
+        }
+        
+        // Handle movement completion
+        if (data.movement_complete) {
+            this.handleMovementComplete(data);
+            return;
+        }
+        
+        // Handle movement progress updates
+        if (data.movement_progress) {
+            this.handleMovementProgress(data);
+        }
+        
+        this.updateRobotVisualization(data);
+        this.updateRobotDisplay(data);
+    }
+    
+    playTrajectoryFrame(data) {
+        const motionId = data.motion_id;
+        const lastStep = data.joint_angles.length - 1;
+        const stepMs = data.dt * 1000;
+        // A frame re-sent mid-move starts at the step the arm is already on
+        const start = performance.now() - (data.start_step || 0) * stepMs;
+        const playback = this.trajectoryPlayback = {};
+        let shownStep = -1;
+        
+        const tick = (now) => {
+            // Stop once a newer movement or a re-sent frame has taken over
+            if (playback !== this.trajectoryPlayback) return;
+            if (motionId && motionId !== this.latestMotionId) return;
+            
+            const step = Math.min(Math.max(0, Math.floor((now - start) / stepMs)), lastStep);
+            if (step !== shownStep) {
+                shownStep = step;
+                const jointAngles = {};
+                data.joint_names.forEach((name, j) => {
+                    jointAngles[name] = data.joint_angles[step][j];
+                });
+                const frame = {
+                    joint_angles: Object.assign(this.latestJointAngles, jointAngles),
+                    end_effector: {
+                        position: data.end_effector.position[step],
+                        orientation: data.end_effector.orientation[step]
+                    }
+                };
+                this.updateRobotVisualization(frame);
+                this.updateRobotDisplay(frame);
+            }
+            if (step < lastStep) requestAnimationFrame(tick);
+        };
+        requestAnimationFrame(tick);
+    }
+    
     handleMovementProgress(data) {
         const progress = data.movement_progress;
         if (progress && progress.is_moving) {
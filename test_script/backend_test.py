@@ -1,5 +1,10 @@
-import asyncio
-import websockets
+"""
+Smoke test against a running backend: triggers /move and prints the WebSocket frames.
+Install its dependencies with `pip install -r test_script/requirements.txt`.
+"""
+
+import json
+import websocket
 import requests
 import threading
 import time
@@ -17,34 +22,47 @@ def trigger_movement():
     except requests.exceptions.RequestException as e:
         print(f"Error calling /move endpoint: {e}")
 
-async def listen_to_robot():
+def listen_to_robot():
     """
     Connects to the WebSocket server and listens for messages.
     """
     uri = "ws://localhost:8766"
-    try:
-        async with websockets.connect(uri) as websocket:
-            print(f"Connected to WebSocket server at {uri}")
-            
-            # Start the movement trigger in a separate thread
-            threading.Thread(target=trigger_movement, daemon=True).start()
-
-            message_count = 0
-            try:
-                # Listen for messages
-                async for message in websocket:
-                    print(f"Received message: {message}")
-                    message_count += 1
-                    if message_count > 5: # Limit the number of messages for this test
-                        break
-            except websockets.exceptions.ConnectionClosed:
-                print("Connection to WebSocket server closed.")
-            
-            print(f"\nTest finished. Received {message_count} messages.")
-
-    except (websockets.exceptions.ConnectionClosedError, ConnectionRefusedError) as e:
-        print(f"Could not connect to WebSocket server at {uri}. Error: {e}")
-        print("Please ensure the backend server is running.")
+    message_count = 0
+
+    def on_open(ws):
+        print(f"Connected to WebSocket server at {uri}")
+
+        # Start the movement trigger in a separate thread
+        threading.Thread(target=trigger_movement, daemon=True).start()
+
+    def on_message(ws, message):
+        nonlocal message_count
+        # The backend sends JSON as binary frames
+        if isinstance(message, bytes):
+            message = message.decode()
+        print(f"Received message: {message}")
+        message_count += 1
+
+        # An automated movement arrives as a single trajectory frame
+        is_trajectory = json.loads(message).get('type') == 'trajectory'
+        if is_trajectory or message_count > 5: # Limit the number of messages for this test
+            ws.close()
+
+    def on_error(ws, error):
+        if isinstance(error, ConnectionRefusedError):
+            print(f"Could not connect to WebSocket server at {uri}. Error: {error}")
+            print("Please ensure the backend server is running.")
+        else:
+            print(f"WebSocket error: {error}")
+
+    def on_close(ws, status_code, reason):
+        print("Connection to WebSocket server closed.")
+
+    ws = websocket.WebSocketApp(uri, on_open=on_open, on_message=on_message,
+                                on_error=on_error, on_close=on_close)
+    ws.run_forever(skip_utf8_validation=True)
+
+    print(f"\nTest finished. Received {message_count} messages.")
 
 if __name__ == "__main__":
-    asyncio.run(listen_to_robot())
+    listen_to_robot()